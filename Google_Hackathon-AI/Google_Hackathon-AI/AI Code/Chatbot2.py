@@ -4,25 +4,40 @@ Implements three modes: Summarize, QnA, and Explain Clauses
 """
 
 import os
+import asyncio
 import logging
 from pathlib import Path
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Iterator, Optional
 
 from dotenv import load_dotenv
 
-# LangChain imports
-from langchain.chains.retrieval import create_retrieval_chain
-from langchain.chains.combine_documents import create_stuff_documents_chain
-from langchain.chains.history_aware_retriever import create_history_aware_retriever
-from langchain_community.vectorstores import FAISS
+# LangChain imports. The Gemini client, langchain.chains and the community vector stores
+# are slow to import, so they are imported where first used; modules that only need the
+# prompt templates below do not pay for them
 from langchain_core.messages import AIMessage, HumanMessage
 from langchain_core.output_parsers import StrOutputParser
 from langchain_core.prompts import ChatPromptTemplate, PromptTemplate
-from langchain_google_genai import ChatGoogleGenerativeAI
+from langchain_core.runnables import RunnableLambda
+
+# Optional client-side rate limiting (langchain-core >= 0.2.24)
+try:
+    from langchain_core.rate_limiters import InMemoryRateLimiter
+except ImportError:
+    InMemoryRateLimiter = None
+
+# Optional prompt compression
+try:
+    from llmlingua import PromptCompressor
+except ImportError:
+    PromptCompressor = None
 
 
 # Local imports
-from utils import DocumentProcessor, EmbeddingManager
+from utils import (
+    batch_similarity_search, create_faiss_index, deduplicate_documents, estimate_tokens,
+    get_document_processor, get_embedding_manager, get_llm_cache, load_faiss_store,
+    normalize_whitespace, split_to_tokens
+)
 
 load_dotenv()
 
@@ -30,6 +45,46 @@ load_dotenv()
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Upper bound on simultaneous Gemini requests issued by batched chains
+MAX_LLM_CONCURRENCY = 8
+
+# Gemini requests per second allowed per API key, to stay under the project's RPM quota
+# when many page prompts are dispatched at once. 0 disables the limiter
+GEMINI_REQUESTS_PER_SECOND = float(os.getenv("GEMINI_REQUESTS_PER_SECOND", "0"))
+
+# Token budget for a single page-summary request; longer pages are split into overlapping
+# pieces (checked locally, so an oversized request never reaches Gemini)
+PAGE_MAX_TOKENS = 8000
+PAGE_SPLIT_OVERLAP_TOKENS = 200
+
+# Pages below this many tokens (blank pages, lone headers/footers) are not sent to the LLM
+MIN_PAGE_TOKENS = 30
+LOW_CONTENT_PLACEHOLDER = "Page {page_number}: minimal content."
+
+# Pages whose summary request still failed after the client's own retries
+FAILED_PAGE_PLACEHOLDER = "Page {page_number}: summary unavailable."
+
+# Page summaries go to the master prompt together as long as they fit in this many tokens;
+# beyond that they are first merged (map-reduce) in packs of consecutive summaries that fit
+SUMMARY_SEPARATOR = "\n\n---\n\n"
+SUMMARY_PACK_TOKENS = 32000
+
+# Chat history is capped; the oldest messages are folded into a running summary
+MAX_CHAT_HISTORY_MESSAGES = 12
+HISTORY_COMPACT_MESSAGES = 6
+
+# Gemini clients created in this process, keyed by API key
+_LLM_CACHE: Dict[str, Any] = {}
+
+# FAISS indexes loaded in this process, keyed by (path, embedding model), with the mtime they
+# were loaded at; a store changed on disk replaces its old entry rather than adding one
+_VECTORSTORE_CACHE: Dict[tuple, tuple] = {}
+
+# Prompt compression (LLMLingua-2) only pays off above this many input tokens
+COMPRESSION_MODEL = "microsoft/llmlingua-2-xlm-roberta-large-meetingbank"
+COMPRESSION_MIN_TOKENS = 1000
+COMPRESSION_RATE = 0.5
+
 # --- PROMPT TEMPLATES (omitted for brevity) ---
 PAGE_PROMPTS_BY_CATEGORY = {
     "TRANSACTIONAL": PromptTemplate(
@@ -239,6 +294,18 @@ MASTER_SUMMARY_PROMPTS = {
     ),
 }
 
+HISTORY_SUMMARY_PROMPT = PromptTemplate(
+    input_variables=["conversation"],
+    template=(
+        "You are assisting a legal document chatbot. Summarize the following earlier part of a conversation "
+        "between a user and the assistant in a few sentences. Keep every question asked, the key facts and "
+        "answers given, and any document sections referenced, so the conversation can continue without it. "
+        "Your response must be in plain text.\n\n"
+        "## Conversation:\n\n{conversation}\n\n"
+        "## Summary:"
+    )
+)
+
 CONCISE_SUMMARY_PROMPT = PromptTemplate(
     input_variables=["detailed_summary"],
     template=(
@@ -254,10 +321,15 @@ CONCISE_SUMMARY_PROMPT = PromptTemplate(
 class LegalDocumentChatbot:
     """RAG-powered chatbot for legal document analysis"""
 
+    # Chunks stuffed into each answer prompt. Answer quality plateaus around 4-5 retrieved chunks
+    # while prompt tokens (latency and cost) keep growing linearly with more; raise with care
+    DEFAULT_MAX_CHUNKS = 4
+
     def __init__(self,
                  vectorstore_path: str = "faiss_index",
                  embedding_model: str = "sentence-transformers/all-MiniLM-L6-v2",
-                 gemini_api_key: str = None):
+                 gemini_api_key: str = None,
+                 compress_prompts: bool = False):
         """
         Initialize the legal document chatbot
         
@@ -265,6 +337,7 @@ class LegalDocumentChatbot:
             vectorstore_path: Path to FAISS index or Pinecone index name
             embedding_model: Name of embedding model
             gemini_api_key: Gemini API key (required)
+            compress_prompts: Compress long summarization inputs with LLMLingua-2
         """
         if not gemini_api_key:
             raise ValueError("Gemini API key is required. Please provide a valid API key.")
@@ -272,10 +345,13 @@ class LegalDocumentChatbot:
         self.vectorstore_path = vectorstore_path
         self.embedding_model = embedding_model
         self.gemini_api_key = gemini_api_key
+        self.compress_prompts = compress_prompts
+        self._prompt_compressor = None
         
         # Initialize components
-        self.embedding_manager = EmbeddingManager(embedding_model)
-        self.doc_processor = DocumentProcessor()
+        embedding_cache_dir = os.path.join(os.path.dirname(os.path.abspath(vectorstore_path)), "embedding_cache")
+        self.embedding_manager = get_embedding_manager(embedding_model, embedding_cache_dir)
+        self.doc_processor = get_document_processor()
         self.vectorstore = None
         self.llm = None
         
@@ -285,7 +361,13 @@ class LegalDocumentChatbot:
         # --- MODERN CONVERSATIONAL APPROACH ---
         # No need for a separate memory object. We will manage history manually.
         self.chat_history: List = [] 
+        self._history_summary: str = ""
+        self._history_summary_chain = None
+        self._concise_chain = None
         self.rag_chain = None # The new, combined RAG chain
+        self._qa_chain = None # Answers from already retrieved documents
+        self._page_chains: Dict[str, Any] = {}
+        self._master_chains: Dict[str, Any] = {}
         
         # Load vector store
         self._load_vectorstore()
@@ -294,6 +376,7 @@ class LegalDocumentChatbot:
         self._initialize_llm()
         
         # Initialize chains
+        self._initialize_summary_chains()
         self._initialize_chains()
     
     def _load_vectorstore(self):
@@ -301,18 +384,34 @@ class LegalDocumentChatbot:
         try:
             # Try to load FAISS index
             if os.path.exists(self.vectorstore_path):
-                self.vectorstore = FAISS.load_local(
-                    self.vectorstore_path, 
-                    self.embedding_manager.get_embeddings(),
-                    allow_dangerous_deserialization=True
-                )
+                # Reuse an index already loaded in this process unless it changed on disk
+                cache_key = (os.path.abspath(self.vectorstore_path), self.embedding_model)
+                mtime = os.stat(self.vectorstore_path).st_mtime
+                if os.path.isdir(self.vectorstore_path):
+                    mtime = max((entry.stat().st_mtime for entry in os.scandir(self.vectorstore_path)), default=mtime)
+                cached = _VECTORSTORE_CACHE.get(cache_key)
+                if cached is not None and cached[0] == mtime:
+                    self.vectorstore = cached[1]
+                    logger.info(f"Reusing loaded FAISS index from: {self.vectorstore_path}")
+                    return
+
+                # Any older version of this store is dropped here, so only one stays in memory
+                _VECTORSTORE_CACHE.pop(cache_key, None)
+                self.vectorstore = load_faiss_store(self.vectorstore_path, self.embedding_manager.get_embeddings())
+                _VECTORSTORE_CACHE[cache_key] = (mtime, self.vectorstore)
                 logger.info(f"Loaded FAISS index from: {self.vectorstore_path}")
             else:
                 logger.warning(f"Vector store not found at: {self.vectorstore_path}")
-                # Create empty FAISS index for demo
-                self.vectorstore = FAISS.from_texts(
-                    ["This is a placeholder document for demo purposes."],
-                    self.embedding_manager.get_embeddings()
+                from langchain_community.docstore.in_memory import InMemoryDocstore
+                from langchain_community.vectorstores import FAISS
+                from langchain_community.vectorstores.utils import DistanceStrategy
+                # Create an empty FAISS index for demo; searches on it simply return no documents
+                self.vectorstore = FAISS(
+                    embedding_function=self.embedding_manager.get_embeddings(),
+                    index=create_faiss_index(self.embedding_manager.get_dimension()),
+                    docstore=InMemoryDocstore(),
+                    index_to_docstore_id={},
+                    distance_strategy=DistanceStrategy.MAX_INNER_PRODUCT
                 )
                 logger.info("Created placeholder vector store for demo")
                 
@@ -323,24 +422,65 @@ class LegalDocumentChatbot:
     def _initialize_llm(self):
         """Initialize the language model"""
         try:
+            # Chatbots sharing an API key share one client and its HTTP connections
+            self.llm = _LLM_CACHE.get(self.gemini_api_key)
+            if self.llm is not None:
+                logger.info("Reusing initialized Gemini LLM")
+                return
+
+            from langchain_google_genai import ChatGoogleGenerativeAI
+            llm_kwargs = {}
+            if GEMINI_REQUESTS_PER_SECOND > 0:
+                if InMemoryRateLimiter is None:
+                    logger.warning("Rate limiter not available, Gemini requests are not throttled")
+                else:
+                    # Every chain shares this client, so the limit covers all concurrent requests
+                    llm_kwargs["rate_limiter"] = InMemoryRateLimiter(
+                        requests_per_second=GEMINI_REQUESTS_PER_SECOND,
+                        max_bucket_size=MAX_LLM_CONCURRENCY
+                    )
             self.llm = ChatGoogleGenerativeAI(
                 model="gemini-1.5-flash", # Use the latest powerful flash model
                 google_api_key=self.gemini_api_key,
-                temperature=0.2 # Slightly lower for more factual answers
+                temperature=0.2, # Slightly lower for more factual answers
+                cache=get_llm_cache(), # Repeat prompts are answered from disk
+                **llm_kwargs
             )
+            _LLM_CACHE[self.gemini_api_key] = self.llm
             logger.info("Initialized Gemini LLM with API key")
                 
         except Exception as e:
             logger.error(f"Error initializing LLM: {str(e)}")
             raise
     
+    def _initialize_summary_chains(self):
+        """Pre-compose the per-category page and master summary chains once"""
+        self._page_chains = {
+            category: prompt | self.llm | StrOutputParser()
+            for category, prompt in PAGE_PROMPTS_BY_CATEGORY.items()
+        }
+        self._master_chains = {
+            category: prompt | self.llm | StrOutputParser()
+            for category, prompt in MASTER_SUMMARY_PROMPTS.items()
+        }
+        self._history_summary_chain = HISTORY_SUMMARY_PROMPT | self.llm | StrOutputParser()
+        self._concise_chain = CONCISE_SUMMARY_PROMPT | self.llm | StrOutputParser()
+
     def _initialize_chains(self):
         """Initialize the RAG chains using the modern LangChain approach"""
         if not self.vectorstore:
             logger.error("Vector store not initialized. Cannot create conversational chain.")
             return
 
-        retriever = self.vectorstore.as_retriever(search_kwargs={"k": 4})
+        from langchain.chains.combine_documents import create_stuff_documents_chain
+        from langchain.chains.history_aware_retriever import create_history_aware_retriever
+        from langchain.chains.retrieval import create_retrieval_chain
+
+        # MMR picks diverse chunks; near-duplicates that still slip through are dropped
+        retriever = self.vectorstore.as_retriever(
+            search_type="mmr",
+            search_kwargs={"k": self.DEFAULT_MAX_CHUNKS, "fetch_k": 20, "lambda_mult": 0.5}
+        ) | RunnableLambda(deduplicate_documents)
 
         # 1. Chain to rephrase the follow-up question
         rephrase_prompt = ChatPromptTemplate.from_messages([
@@ -371,11 +511,31 @@ class LegalDocumentChatbot:
         ])
         
         question_answer_chain = create_stuff_documents_chain(self.llm, qa_prompt)
+        self._qa_chain = question_answer_chain
 
         # 3. Combine them into the final RAG chain
         self.rag_chain = create_retrieval_chain(context_retriever, question_answer_chain)
         logger.info("Initialized modern RAG chain (create_retrieval_chain)")
         
+    def batch_retrieve(self, queries: List[str], k: Optional[int] = None) -> List[List[Any]]:
+        """
+        Retrieve the top-k chunks for several queries at once (batched questions, evaluation runs).
+        All queries are embedded in one call and searched in one FAISS call.
+        
+        Args:
+            queries: Questions or clause texts to look up
+            k: Number of chunks per query (default: DEFAULT_MAX_CHUNKS)
+            
+        Returns:
+            One list of de-duplicated documents per query, in query order
+        """
+        if not self.vectorstore:
+            return [[] for _ in queries]
+        results = batch_similarity_search(
+            self.vectorstore, self.embedding_manager.get_embeddings(), queries, k or self.DEFAULT_MAX_CHUNKS
+        )
+        return [deduplicate_documents(documents) for documents in results]
+
     def answer_question(self, question: str) -> str:
         """
         Answer a question based on the uploaded documents, maintaining conversation history.
@@ -398,17 +558,173 @@ class LegalDocumentChatbot:
                 "chat_history": self.chat_history,
                 "input": question
             })
+            self._log_context_size(response)
             
             # Update the chat history
             self.chat_history.append(HumanMessage(content=question))
             self.chat_history.append(AIMessage(content=response["answer"]))
+            self._compact_chat_history()
             
             return response.get('answer', "Sorry, I couldn't generate an answer.")
             
         except Exception as e:
             logger.error(f"Error answering question: {str(e)}")
             return f"Error answering question: {str(e)}"
-    
+
+    @staticmethod
+    def _log_context_size(response: Dict[str, Any]):
+        """Logs how many chunks and (estimated) tokens of context went into an answer prompt."""
+        context = response.get("context") or []
+        context_tokens = sum(estimate_tokens(doc.page_content) for doc in context)
+        logger.info(f"Answer prompt context: {len(context)} chunks, ~{context_tokens} tokens")
+
+    def answer_questions(self, questions: List[str]) -> List[str]:
+        """
+        Answer several standalone questions at once, e.g. a batch from the UI or an evaluation run.
+        Retrieval for all of them is one embedding call and one index search, and the answers are
+        requested concurrently. The questions are answered without (and are not added to) the
+        conversation history.
+        
+        Args:
+            questions: Questions to answer
+            
+        Returns:
+            One answer (or error message) per question, in order
+        """
+        if not self._qa_chain:
+            return ["The Question-Answering system is not initialized. Please upload a document first."] * len(questions)
+
+        answers = ["Please provide a question to answer."] * len(questions)
+        asked = [i for i, question in enumerate(questions) if question.strip()]
+        try:
+            contexts = self.batch_retrieve([questions[i] for i in asked])
+        except Exception as e:
+            logger.error(f"Error answering questions: {str(e)}")
+            return [f"Error answering question: {str(e)}"] * len(questions)
+
+        responses = self._qa_chain.batch(
+            [{"context": context, "input": questions[i], "chat_history": []} for i, context in zip(asked, contexts)],
+            config={"max_concurrency": MAX_LLM_CONCURRENCY},
+            return_exceptions=True
+        )
+        for i, response in zip(asked, responses):
+            if isinstance(response, Exception):
+                logger.error(f"Error answering question: {str(response)}")
+                response = f"Error answering question: {str(response)}"
+            answers[i] = response
+        return answers
+
+    async def aanswer_question(self, question: str) -> str:
+        """Async version of answer_question for callers running an event loop."""
+        try:
+            if not self.rag_chain:
+                return "The Question-Answering system is not initialized. Please upload a document first."
+            
+            if not question.strip():
+                return "Please provide a question to answer."
+
+            response = await self.rag_chain.ainvoke({
+                "chat_history": self.chat_history,
+                "input": question
+            })
+            self._log_context_size(response)
+            
+            self.chat_history.append(HumanMessage(content=question))
+            self.chat_history.append(AIMessage(content=response["answer"]))
+            await self._acompact_chat_history()
+            
+            return response.get('answer', "Sorry, I couldn't generate an answer.")
+            
+        except Exception as e:
+            logger.error(f"Error answering question: {str(e)}")
+            return f"Error answering question: {str(e)}"
+
+    def answer_question_stream(self, question: str) -> Iterator[str]:
+        """
+        Streaming version of answer_question: yields the answer in pieces as Gemini
+        generates them, so a UI can start rendering before the full answer is ready.
+        The complete answer is added to the conversation history once streaming ends.
+        """
+        if not self.rag_chain:
+            yield "The Question-Answering system is not initialized. Please upload a document first."
+            return
+
+        if not question.strip():
+            yield "Please provide a question to answer."
+            return
+
+        answer_parts = []
+        try:
+            for chunk in self.rag_chain.stream({
+                "chat_history": self.chat_history,
+                "input": question
+            }):
+                if "answer" in chunk:
+                    answer_parts.append(chunk["answer"])
+                    yield chunk["answer"]
+        except Exception as e:
+            logger.error(f"Error answering question: {str(e)}")
+            yield f"Error answering question: {str(e)}"
+            return
+
+        self.chat_history.append(HumanMessage(content=question))
+        self.chat_history.append(AIMessage(content="".join(answer_parts)))
+        self._compact_chat_history()
+
+    def _compact_chat_history(self):
+        """
+        Keep the history sent with every question bounded. Once it grows past
+        MAX_CHAT_HISTORY_MESSAGES, the oldest messages (including any previous summary)
+        are replaced by a single summary message.
+        """
+        if len(self.chat_history) <= MAX_CHAT_HISTORY_MESSAGES:
+            return
+
+        recent = self.chat_history[HISTORY_COMPACT_MESSAGES:]
+        try:
+            summary = self._history_summary_chain.invoke({"conversation": self._oldest_conversation()})
+        except Exception as e:
+            logger.warning(f"Could not summarize chat history, dropping oldest messages: {str(e)}")
+            self.chat_history = recent
+            return
+        self._set_history_summary(summary, recent)
+
+    async def _acompact_chat_history(self):
+        """Async version of _compact_chat_history."""
+        if len(self.chat_history) <= MAX_CHAT_HISTORY_MESSAGES:
+            return
+
+        recent = self.chat_history[HISTORY_COMPACT_MESSAGES:]
+        try:
+            summary = await self._history_summary_chain.ainvoke({"conversation": self._oldest_conversation()})
+        except Exception as e:
+            logger.warning(f"Could not summarize chat history, dropping oldest messages: {str(e)}")
+            self.chat_history = recent
+            return
+        self._set_history_summary(summary, recent)
+
+    def _oldest_conversation(self) -> str:
+        """The messages about to be compacted, as a plain-text transcript."""
+        return "\n".join(
+            f"{'User' if isinstance(message, HumanMessage) else 'Assistant'}: {message.content}"
+            for message in self.chat_history[:HISTORY_COMPACT_MESSAGES]
+        )
+
+    def _set_history_summary(self, summary: str, recent: List):
+        """Replaces the compacted messages with a single summary message."""
+        self._history_summary = summary
+        self.chat_history = [AIMessage(content=f"Prior conversation summary: {self._history_summary}")] + recent
+
+    def clear_cache(self):
+        """
+        Forget cached Gemini responses (page, master and concise summaries, answers), e.g. after
+        changing a prompt template. The cache is shared by every chatbot in the process.
+        """
+        llm_cache = get_llm_cache()
+        if llm_cache is not None:
+            llm_cache.clear()
+            logger.info("Cleared LLM response cache")
+
     def get_document_info(self) -> Dict[str, Any]:
         """
         Get information about the loaded documents
@@ -420,10 +736,11 @@ class LegalDocumentChatbot:
             if not self.vectorstore:
                 return {"status": "No documents loaded"}
             
-            doc_count = len(self.vectorstore.docstore._dict)
+            docs = self.vectorstore.docstore._dict
+            doc_count = len(docs)
             
-            sample_docs = self.vectorstore.similarity_search("", k=5)
-            sources = list(set([doc.metadata.get('source', 'Unknown') for doc in sample_docs]))
+            # Read sources straight from the docstore; no embedding or index search needed
+            sources = list({doc.metadata.get('source', 'Unknown') for doc in docs.values()})
             
             return {
                 "status": "Documents loaded",
@@ -436,9 +753,31 @@ class LegalDocumentChatbot:
             logger.error(f"Error getting document info: {str(e)}")
             return {"status": f"Error: {str(e)}"}
             
-    def summarize_document(self, pdf_path: str, category: Optional[str] = None) -> Dict[str, Any]:
+    def _compress_text(self, text: str) -> str:
         """
-        Summarizes each page of a legal document and also generates a master summary.
+        Compress a long prompt input with LLMLingua-2 if prompt compression is enabled.
+        Short inputs are returned unchanged since compressing them costs more than it saves.
+        """
+        if not self.compress_prompts or estimate_tokens(text) < COMPRESSION_MIN_TOKENS:
+            return text
+
+        if PromptCompressor is None:
+            logger.warning("LLMLingua not available. Install with: pip install llmlingua")
+            self.compress_prompts = False
+            return text
+
+        try:
+            if self._prompt_compressor is None:
+                self._prompt_compressor = PromptCompressor(model_name=COMPRESSION_MODEL, use_llmlingua2=True)
+            return self._prompt_compressor.compress_prompt(text, rate=COMPRESSION_RATE)["compressed_prompt"]
+        except Exception as e:
+            logger.warning(f"Prompt compression failed, using original text: {str(e)}")
+            return text
+
+    def _prepare_summary(self, pdf_path: str, category: Optional[str] = None):
+        """
+        Resolves the document category and extracts the page texts to summarize.
+        Returns the page summary chain, the master summary chain and the page texts.
         """
         if not self.llm:
             raise ValueError("LLM not initialized. Cannot summarize.")
@@ -452,29 +791,220 @@ class LegalDocumentChatbot:
             except Exception:
                 category = "OTHERS"
 
-        prompt = PAGE_PROMPTS_BY_CATEGORY.get(str(category), PAGE_PROMPTS_BY_CATEGORY["OTHERS"])
-        master_prompt = MASTER_SUMMARY_PROMPTS.get(str(category), MASTER_SUMMARY_PROMPTS["OTHERS"])
+        page_summary_chain = self._page_chains.get(str(category), self._page_chains["OTHERS"])
+        master_summary_chain = self._master_chains.get(str(category), self._master_chains["OTHERS"])
+
+        pages = self.doc_processor.get_page_texts(pdf_path)
+        pages = [normalize_whitespace(page_text) for page_text in pages]
+        # Blank pages are kept so that page_summaries stays aligned with page numbers
+        pages = [self._compress_text(page_text) if page_text else page_text for page_text in pages]
+
+        return page_summary_chain, master_summary_chain, pages
+
+    @staticmethod
+    def _fits_in_one_prompt(summaries: List[str]) -> bool:
+        """True if the summaries can go to the master prompt as they are."""
+        return len(summaries) <= 1 or sum(map(estimate_tokens, summaries)) <= SUMMARY_PACK_TOKENS
+
+    @staticmethod
+    def _group_summaries(summaries: List[str]) -> List[Dict[str, str]]:
+        """
+        Packs consecutive summaries into master-prompt inputs of up to SUMMARY_PACK_TOKENS tokens.
+        Every pack holds at least two summaries, so each reduce round shrinks the list.
+        """
+        packs: List[List[str]] = []
+        pack: List[str] = []
+        pack_tokens = 0
+        for summary in summaries:
+            tokens = estimate_tokens(summary)
+            if len(pack) >= 2 and pack_tokens + tokens > SUMMARY_PACK_TOKENS:
+                packs.append(pack)
+                pack, pack_tokens = [], 0
+            pack.append(summary)
+            pack_tokens += tokens
+        if pack:
+            packs.append(pack)
+        return [{"combined_summaries": SUMMARY_SEPARATOR.join(pack)} for pack in packs]
+
+    @staticmethod
+    def _content_page_indices(pages: List[str]) -> List[int]:
+        """Indices of the pages with enough text to be worth an LLM call."""
+        return [i for i, page_text in enumerate(pages) if estimate_tokens(page_text) >= MIN_PAGE_TOKENS]
+
+    @staticmethod
+    def _representative_pages(pages: List[str], indices: List[int]) -> Dict[int, int]:
+        """
+        Maps each page index to the first of them with identical (normalized) text, so repeated
+        pages such as boilerplate or duplicated exhibits are summarized once. Only exact repeats
+        are merged: pages differing in a name, amount or date need their own summaries.
+        """
+        first_with_text: Dict[str, int] = {}
+        return {i: first_with_text.setdefault(pages[i], i) for i in indices}
+
+    @staticmethod
+    def _page_requests(pages: List[str], indices: List[int]):
+        """
+        Page-summary inputs for the given pages, in order: one per page, or one per piece for a page
+        over PAGE_MAX_TOKENS. Returns the page index each input belongs to, and the inputs.
+        """
+        owners: List[int] = []
+        inputs: List[Dict[str, str]] = []
+        for i in indices:
+            for piece in split_to_tokens(pages[i], PAGE_MAX_TOKENS, PAGE_SPLIT_OVERLAP_TOKENS):
+                owners.append(i)
+                inputs.append({"chunk": piece})
+        return owners, inputs
+
+    @staticmethod
+    def _merge_page_pieces(owners: List[int], results: List[Any]) -> Dict[int, Any]:
+        """Joins the summaries of a split page's pieces in order; a page with a failed piece maps to that error."""
+        parts_by_page: Dict[int, List[Any]] = {}
+        for owner, result in zip(owners, results):
+            parts_by_page.setdefault(owner, []).append(result)
+        return {
+            owner: next((part for part in parts if isinstance(part, Exception)), None) or SUMMARY_SEPARATOR.join(parts)
+            for owner, parts in parts_by_page.items()
+        }
+
+    @staticmethod
+    def _longest_first(pages: List[str], indices: List[int]) -> List[int]:
+        """
+        Order in which to send page prompts: longest pages first. With at most MAX_LLM_CONCURRENCY
+        requests in flight, the slowest requests then start early instead of trailing at the end.
+        """
+        return sorted(indices, key=lambda i: len(pages[i]), reverse=True)
+
+    @staticmethod
+    def _align_page_summaries(page_count: int, representatives: Dict[int, int],
+                              summaries_by_page: Dict[int, str]) -> List[str]:
+        """
+        Places the generated summaries at their page positions. Skipped pages get a placeholder,
+        as do pages whose summary request failed.
+        """
+        page_summaries = [LOW_CONTENT_PLACEHOLDER.format(page_number=i + 1) for i in range(page_count)]
+        for index, representative in representatives.items():
+            summary = summaries_by_page.get(representative)
+            page_summaries[index] = summary if summary is not None else FAILED_PAGE_PLACEHOLDER.format(page_number=index + 1)
+        return page_summaries
+
+    @staticmethod
+    def _drop_failed_summaries(summaries_by_page: Dict[int, Any]) -> Dict[int, str]:
+        """
+        Removes the pages whose summary request raised, logging them in a single warning.
+        If every page failed there is nothing to summarize, so the first error is raised.
+        """
+        failed = {i: result for i, result in summaries_by_page.items() if isinstance(result, Exception)}
+        if not failed:
+            return summaries_by_page
+        if len(failed) == len(summaries_by_page):
+            raise next(iter(failed.values()))
+
+        page_numbers = ", ".join(str(i + 1) for i in sorted(failed))
+        logger.warning(f"Could not summarize pages {page_numbers}: {str(next(iter(failed.values())))}")
+        return {i: result for i, result in summaries_by_page.items() if i not in failed}
+
+    @staticmethod
+    def _is_placeholder(page_number: int, summary: str) -> bool:
+        """True if a page summary is a placeholder rather than generated text."""
+        return summary in (
+            LOW_CONTENT_PLACEHOLDER.format(page_number=page_number),
+            FAILED_PAGE_PLACEHOLDER.format(page_number=page_number)
+        )
+
+    def _reduce_summaries(self, master_summary_chain, summaries: List[str]) -> List[str]:
+        """
+        Map-reduce a long list of summaries: merge them in packs through the master chain
+        until they fit in SUMMARY_PACK_TOKENS, keeping the final prompt bounded.
+        """
+        while not self._fits_in_one_prompt(summaries):
+            summaries = master_summary_chain.batch(
+                self._group_summaries(summaries),
+                config={"max_concurrency": MAX_LLM_CONCURRENCY}
+            )
+        return summaries
+
+    async def _areduce_summaries(self, master_summary_chain, summaries: List[str]) -> List[str]:
+        """Async version of _reduce_summaries."""
+        while not self._fits_in_one_prompt(summaries):
+            summaries = await master_summary_chain.abatch(
+                self._group_summaries(summaries),
+                config={"max_concurrency": MAX_LLM_CONCURRENCY}
+            )
+        return summaries
+
+    def summarize_document(self, pdf_path: str, category: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Summarizes each page of a legal document and also generates a master summary.
+        """
+        page_summary_chain, master_summary_chain, pages = self._prepare_summary(pdf_path, category)
 
         # >>>>> CHANGE 2: Assign the generated summaries to self.page_summaries <<<<<
         self.page_summaries = [] 
-        page_summary_chain = prompt | self.llm | StrOutputParser()
-
-        page_count = self.doc_processor.get_page_count(pdf_path)
 
-        for i in range(page_count):
-            page_text = self.doc_processor.get_text_from_page(pdf_path, i)
-            if page_text.strip():
-                summary = page_summary_chain.invoke({"chunk": page_text})
-                self.page_summaries.append(summary)
+        # Dispatch all page prompts together; LangChain runs them concurrently
+        content_indices = self._content_page_indices(pages)
+        representatives = self._representative_pages(pages, content_indices)
+        unique_indices = sorted(set(representatives.values()))
+        summaries_by_page: Dict[int, str] = {}
+        if unique_indices:
+            # A failed page (after the client's retries) does not fail the whole document
+            owners, inputs = self._page_requests(pages, self._longest_first(pages, unique_indices))
+            summaries_by_page = self._drop_failed_summaries(self._merge_page_pieces(owners, page_summary_chain.batch(
+                inputs,
+                config={"max_concurrency": MAX_LLM_CONCURRENCY},
+                return_exceptions=True
+            )))
+        self.page_summaries = self._align_page_summaries(len(pages), representatives, summaries_by_page)
 
-        combined_summaries = "\n\n---\n\n".join(self.page_summaries)
-        master_summary_chain = master_prompt | self.llm | StrOutputParser()
+        # Placeholders, and repeats of identical pages, are left out of the master summary
+        reduced_summaries = self._reduce_summaries(
+            master_summary_chain, [summaries_by_page[i] for i in unique_indices if i in summaries_by_page]
+        )
+        combined_summaries = self._compress_text(SUMMARY_SEPARATOR.join(reduced_summaries))
         master_summary = master_summary_chain.invoke({"combined_summaries": combined_summaries})
 
         return {
             "page_summaries": self.page_summaries,
             "master_summary": master_summary
         }
+
+    async def asummarize_document(self, pdf_path: str, category: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Async version of summarize_document for callers running an event loop.
+        Page summaries are requested concurrently, capped at MAX_LLM_CONCURRENCY in flight.
+        """
+        # Classification and PDF extraction are blocking, keep them off the event loop
+        loop = asyncio.get_running_loop()
+        page_summary_chain, master_summary_chain, pages = await loop.run_in_executor(
+            None, self._prepare_summary, pdf_path, category
+        )
+
+        semaphore = asyncio.Semaphore(MAX_LLM_CONCURRENCY)
+
+        async def summarize_page(page_text: str) -> str:
+            async with semaphore:
+                return await page_summary_chain.ainvoke({"chunk": page_text})
+
+        content_indices = self._content_page_indices(pages)
+        representatives = self._representative_pages(pages, content_indices)
+        unique_indices = sorted(set(representatives.values()))
+        owners, inputs = self._page_requests(pages, self._longest_first(pages, unique_indices))
+        summaries_by_page = self._drop_failed_summaries(self._merge_page_pieces(
+            owners,
+            await asyncio.gather(*(summarize_page(request["chunk"]) for request in inputs), return_exceptions=True)
+        ))
+        self.page_summaries = self._align_page_summaries(len(pages), representatives, summaries_by_page)
+
+        reduced_summaries = await self._areduce_summaries(
+            master_summary_chain, [summaries_by_page[i] for i in unique_indices if i in summaries_by_page]
+        )
+        combined_summaries = self._compress_text(SUMMARY_SEPARATOR.join(reduced_summaries))
+        master_summary = await master_summary_chain.ainvoke({"combined_summaries": combined_summaries})
+
+        return {
+            "page_summaries": self.page_summaries,
+            "master_summary": master_summary
+        }
     
     def get_concise_page_summary(self, page_number: int) -> str:
         """
@@ -487,15 +1017,51 @@ class LegalDocumentChatbot:
         if not (0 <= index < len(self.page_summaries)):
             return f"Error: Invalid page number. Please provide a number between 1 and {len(self.page_summaries)}."
 
+        detailed_summary = self.page_summaries[index]
+        if self._is_placeholder(page_number, detailed_summary):
+            return detailed_summary
+
         try:
-            detailed_summary = self.page_summaries[index]
-            concise_chain = CONCISE_SUMMARY_PROMPT | self.llm | StrOutputParser()
-            concise_summary = concise_chain.invoke({"detailed_summary": detailed_summary})
+            concise_summary = self._concise_chain.invoke({"detailed_summary": detailed_summary})
             return concise_summary
         except Exception as e:
             logger.error(f"Error generating concise summary for page {page_number}: {str(e)}")
             return f"An error occurred while summarizing page {page_number}."
 
+    def get_concise_page_summaries(self, page_numbers: List[int]) -> Dict[int, str]:
+        """
+        Generates concise summaries for several pages at once, requesting them concurrently.
+        Returns a mapping of page number to summary (or to an error message for that page).
+        """
+        if not self.page_summaries:
+            error = "Error: Please summarize a document first before requesting a page summary."
+            return {page_number: error for page_number in page_numbers}
+
+        results: Dict[int, str] = {}
+        valid_pages = []
+        for page_number in page_numbers:
+            if 1 <= page_number <= len(self.page_summaries):
+                detailed_summary = self.page_summaries[page_number - 1]
+                if self._is_placeholder(page_number, detailed_summary):
+                    results[page_number] = detailed_summary
+                else:
+                    valid_pages.append(page_number)
+            else:
+                results[page_number] = f"Error: Invalid page number. Please provide a number between 1 and {len(self.page_summaries)}."
+
+        summaries = self._concise_chain.batch(
+            [{"detailed_summary": self.page_summaries[page_number - 1]} for page_number in valid_pages],
+            config={"max_concurrency": MAX_LLM_CONCURRENCY},
+            return_exceptions=True
+        )
+        for page_number, summary in zip(valid_pages, summaries):
+            if isinstance(summary, Exception):
+                logger.error(f"Error generating concise summary for page {page_number}: {str(summary)}")
+                summary = f"An error occurred while summarizing page {page_number}."
+            results[page_number] = summary
+
+        return results
+
 def create_chatbot(api_key: str):
     """Create a chatbot instance with the provided API key"""
     return LegalDocumentChatbot(
@@ -503,24 +1069,15 @@ def create_chatbot(api_key: str):
         gemini_api_key=api_key
     )
 
-if __name__ == "__main__":
-    if __package__ is None:
-        import sys
-        sys.path.append(str(Path(__file__).parent.parent))
-
-    api_key = os.getenv("GEMINI_API_KEY")
-    if not api_key:
-        print("Error: GEMINI_API_KEY environment variable not set")
-        exit(1)
-    
-    chatbot = create_chatbot(api_key)
-    
-    # --- Example Usage ---
-    pdf_for_summary = r"path/to/your/document.pdf" # <-- IMPORTANT: SET YOUR PDF PATH HERE
-    
+async def _run_demo(chatbot: LegalDocumentChatbot, pdf_for_summary: str):
+    """Runs the example usage; the summary and the first question are independent, so they run concurrently."""
+    question1 = "explain article 7"
     if os.path.exists(pdf_for_summary):
+        summary_data, answer1 = await asyncio.gather(
+            chatbot.asummarize_document(pdf_path=pdf_for_summary),
+            chatbot.aanswer_question(question1)
+        )
         print("\n=== Document Summary ===")
-        summary_data = chatbot.summarize_document(pdf_path=pdf_for_summary)
         print("--- MASTER SUMMARY ---")
         print(summary_data["master_summary"])
         print("\n--- CONCISE SUMMARY FOR PAGE 1 ---")
@@ -528,17 +1085,32 @@ if __name__ == "__main__":
         print(concise_summary)
     else:
         print(f"File not found: {pdf_for_summary}. Skipping summarization test.")
+        answer1 = await chatbot.aanswer_question(question1)
 
     print("\n=== Question Answering (with Memory) ===")
     
     # First question
-    question1 = "explain article 7"
     print(f"User: {question1}")
-    answer1 = chatbot.answer_question(question1)
     print(f"Chatbot: {answer1}")
     
     # Second question that relies on the context of the first
     question2 = "what is most important thing about above question answer??"
     print(f"\nUser: {question2}")
-    answer2 = chatbot.answer_question(question2)
+    answer2 = await chatbot.aanswer_question(question2)
     print(f"Chatbot: {answer2}")
+
+if __name__ == "__main__":
+    if __package__ is None:
+        import sys
+        sys.path.append(str(Path(__file__).parent.parent))
+
+    api_key = os.getenv("GEMINI_API_KEY")
+    if not api_key:
+        print("Error: GEMINI_API_KEY environment variable not set")
+        exit(1)
+    
+    chatbot = create_chatbot(api_key)
+    
+    # --- Example Usage ---
+    pdf_for_summary = r"path/to/your/document.pdf" # <-- IMPORTANT: SET YOUR PDF PATH HERE
+    asyncio.run(_run_demo(chatbot, pdf_for_summary))
@@ -1,21 +1,43 @@
 """
 Optimized Legal Document Analyzer (Python)
-Processes legal documents in 2-page batches using direct Gemini API calls.
+Processes legal documents in token-budgeted page chunks using direct Gemini API calls.
 Removes CrewAI overhead to reduce API quota usage.
 """
 
 import os
+import asyncio
+import atexit
+import hashlib
+import heapq
+import itertools
 import logging
 import json
+import re
+import sys
+import tempfile
+import threading
+import weakref
+from collections import Counter
 import time
 from datetime import datetime
-from typing import List, Dict, Any
-from pydantic import BaseModel, Field, ValidationError
+from functools import lru_cache
+from typing import List, Dict, Any, Iterator, Literal, Optional, Tuple
+from pydantic import BaseModel, Field, TypeAdapter, ValidationError
+from typing_extensions import TypedDict  # pydantic only accepts this TypedDict before Python 3.12
 from dotenv import load_dotenv
 import google.generativeai as genai
-from utils import DocumentProcessor
+import google.ai.generativelanguage as glm
+from google.api_core.client_options import ClientOptions
+from google.api_core import exceptions as google_exceptions
+from utils import estimate_tokens, find_near_duplicates, get_document_processor
 from enum import Enum
 
+# Optional faster JSON parsing
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
 # Load environment variables
 load_dotenv()
 GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
@@ -29,6 +51,132 @@ genai.configure(api_key=GEMINI_API_KEY)
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Upper bound on Gemini requests in flight at once; keep within the project's Gemini RPM quota
+MAX_CONCURRENT_CHUNKS = int(os.getenv("MAX_CONCURRENT_CHUNKS", "8"))
+
+# Gemini quota shared by all requests of an analyzer (defaults are the Flash free tier)
+GEMINI_RPM = int(os.getenv("GEMINI_RPM", "15"))
+GEMINI_TPM = int(os.getenv("GEMINI_TPM", "1000000"))
+
+# Retries for rate-limited (429) requests that slip past the limiter, with exponential backoff
+MAX_RATE_LIMIT_RETRIES = 3
+RATE_LIMIT_BACKOFF_SECONDS = 2.0
+
+# Pages are packed greedily into chunks of up to this many input tokens
+TARGET_CHUNK_TOKENS = 6000
+
+# A chunk also ends after any page whose content hash is divisible by this (about every 4 pages).
+# Boundaries then depend on page content rather than position, so after an edit the chunking
+# falls back into step and only the chunks around the change miss the analysis cache.
+CHUNK_BOUNDARY_MODULUS = 4
+
+# Chunks without any of these terms (signature blocks, tables of contents, rate schedules)
+# are very unlikely to hold a risky clause and are not sent to Gemini. Stems are kept short
+# so every inflection matches (indemnity/indemnify, liable/liability, compete/non-competition)
+RISK_HINTS_RE = re.compile(
+    r'\b(indemn|liab|harmless|terminat|cancel|forfeit|warrant|confidential|arbitrat|jurisdiction|'
+    r'amend|assign|penalt|damages|waive|exclusiv|compet|renew|govern(?:ing)? law)',
+    re.IGNORECASE
+)
+
+# Chunks this similar (word 5-gram Jaccard) to an earlier chunk are repeated boilerplate and not re-analyzed
+CHUNK_DUPLICATE_THRESHOLD = 0.8
+
+# Risk levels kept in the final report, in report order
+# Risk levels are normalized to these interned constants when a response is parsed,
+# so later passes compare and hash them without re-uppercasing per clause
+RISK_CRITICAL = sys.intern('CRITICAL')
+RISK_HIGH = sys.intern('HIGH')
+RISK_LEVELS = {RISK_CRITICAL: RISK_CRITICAL, RISK_HIGH: RISK_HIGH}
+RISK_PRIORITY = {RISK_CRITICAL: 0, RISK_HIGH: 1}
+
+# Chunks packed into one Gemini request; larger batches make each call disproportionately slower
+CHUNKS_PER_REQUEST = 3
+
+# Chunk analyses are cached on disk, keyed by chunk text, model and prompt version.
+# Bump PROMPT_VERSION whenever the system instruction or _create_analysis_prompt changes.
+ANALYSIS_CACHE_DIR = os.getenv("ANALYSIS_CACHE_DIR", ".legal_cache")
+PROMPT_VERSION = "3"
+
+# Response schema enforced by Gemini's structured output mode, mirroring ClauseAnalysis
+CLAUSE_SCHEMA = {
+    "type": "OBJECT",
+    "properties": {
+        "clause_title": {"type": "STRING"},
+        "clause_summary": {"type": "STRING"},
+        "risk_level": {"type": "STRING", "enum": ["HIGH", "CRITICAL"]},
+        "risk_explanation": {"type": "STRING"},
+        "page_number": {"type": "INTEGER"},
+    },
+    "required": ["clause_title", "clause_summary", "risk_level", "risk_explanation", "page_number"],
+}
+RESPONSE_SCHEMA = {
+    "type": "OBJECT",
+    "properties": {
+        "results": {
+            "type": "ARRAY",
+            "items": {
+                "type": "OBJECT",
+                "properties": {
+                    "chunk_id": {"type": "INTEGER"},
+                    "clauses": {"type": "ARRAY", "items": CLAUSE_SCHEMA},
+                },
+                "required": ["chunk_id", "clauses"],
+            },
+        },
+    },
+    "required": ["results"],
+}
+
+# Per-request prompt around the document chunks; everything static is in the system instruction
+PROMPT_HEADER = """DOCUMENT CHUNKS TO ANALYZE:
+---
+"""
+PROMPT_SUFFIX = """
+---
+
+JSON OUTPUT:"""
+
+# Event loops behind the synchronous analyze_document, one per calling thread and shared by
+# every analyzer on it. The async Gemini client holds one gRPC (HTTP/2) channel bound to the
+# event loop that first used it; reusing the loop keeps that channel, and its TLS connection,
+# alive across documents instead of reconnecting each time.
+_sync_loops = threading.local()
+_all_sync_loops: List[asyncio.AbstractEventLoop] = []
+
+# One async Gemini client per event loop, since a client cannot be used from another loop
+_async_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Any]" = weakref.WeakKeyDictionary()
+_async_clients_lock = threading.Lock()
+
+
+def _run_on_sync_loop(coro):
+    """Runs a coroutine to completion on this thread's loop, creating it on first use."""
+    loop = getattr(_sync_loops, "loop", None)
+    if loop is None or loop.is_closed():
+        loop = asyncio.new_event_loop()
+        _sync_loops.loop = loop
+        _all_sync_loops.append(loop)
+    return loop.run_until_complete(coro)
+
+
+@atexit.register
+def _close_sync_loops():
+    """Closes the loops started by synchronous analyses at exit."""
+    for loop in _all_sync_loops:
+        if not loop.is_closed():
+            loop.close()
+
+
+def _async_client_for_loop(loop: asyncio.AbstractEventLoop) -> glm.GenerativeServiceAsyncClient:
+    """The async Gemini client of an event loop, created on first use."""
+    with _async_clients_lock:
+        client = _async_clients.get(loop)
+        if client is None:
+            client = glm.GenerativeServiceAsyncClient(client_options=ClientOptions(api_key=GEMINI_API_KEY))
+            _async_clients[loop] = client
+        return client
+
+
 # --- Pydantic Models (UPDATED) ---
 class RiskLevel(str, Enum):
     HIGH = "HIGH"
@@ -41,31 +189,194 @@ class ClauseAnalysis(BaseModel):
     risk_explanation: str = Field(..., description="Brief explanation for the assigned risk")
     page_number: int = Field(..., description="Page number where the clause appears")
 
+class ClauseDict(TypedDict):
+    """Plain-dict form of ClauseAnalysis, validated without building model instances."""
+    clause_title: str
+    clause_summary: str
+    risk_level: Literal["HIGH", "CRITICAL"]
+    risk_explanation: str
+    page_number: int
+
+# Compiled once: validating a whole list is a single call into pydantic-core
+_CLAUSES_ADAPTER = TypeAdapter(List[ClauseDict])
+_CLAUSE_ADAPTER = TypeAdapter(ClauseDict)
+
+
+def _split_page(text: str, max_tokens: int) -> List[str]:
+    """Split a page that is over the token budget at paragraph boundaries (hard-splitting huge paragraphs)."""
+    if estimate_tokens(text) <= max_tokens:
+        return [text]
+
+    max_chars = max_tokens * 4
+    parts: List[str] = []
+    current = ""
+    for paragraph in text.split("\n\n"):
+        while len(paragraph) > max_chars:
+            if current:
+                parts.append(current)
+                current = ""
+            parts.append(paragraph[:max_chars])
+            paragraph = paragraph[max_chars:]
+        if current and len(current) + len(paragraph) + 2 > max_chars:
+            parts.append(current)
+            current = paragraph
+        else:
+            current = f"{current}\n\n{paragraph}" if current else paragraph
+    if current:
+        parts.append(current)
+    return parts
+
+
+def _is_chunk_boundary(page_text: str) -> bool:
+    """Content-defined chunk boundary: the same page text always gives the same answer."""
+    digest = hashlib.sha256(page_text.encode('utf-8')).digest()
+    return int.from_bytes(digest[:4], 'big') % CHUNK_BOUNDARY_MODULUS == 0
+
+
+def _loads(text: str) -> Any:
+    """Parse JSON with orjson when it is installed (its errors subclass json.JSONDecodeError)."""
+    return orjson.loads(text) if orjson is not None else json.loads(text)
+
+class ChunkAnalysisCache:
+    """
+    Content-addressed on-disk cache of the validated clauses found in a chunk.
+    Entries are keyed by sha256(model, prompt version, chunk text), so editing a
+    document only misses on the chunks that changed. Only clauses parsed from a
+    successful response are stored; failed or missing results are never cached.
+    """
+
+    def __init__(self, model_name: str, cache_dir: str = ANALYSIS_CACHE_DIR, prompt_version: str = PROMPT_VERSION):
+        self.model_name = model_name
+        self.cache_dir = cache_dir
+        self.prompt_version = prompt_version
+
+    def _path(self, chunk_text: str) -> str:
+        key = hashlib.sha256(
+            f"{self.model_name}\0{self.prompt_version}\0{chunk_text}".encode('utf-8')
+        ).hexdigest()
+        return os.path.join(self.cache_dir, f"{key}.json")
+
+    def get(self, chunk_text: str) -> Optional[List[ClauseDict]]:
+        """Returns the cached clauses for a chunk, or None if it has not been analyzed before."""
+        try:
+            with open(self._path(chunk_text), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            logger.warning(f"Ignoring unreadable analysis cache entry: {e}")
+            return None
+
+    def set(self, chunk_text: str, clauses: List[ClauseDict]):
+        """Stores the clauses for a chunk. The entry appears atomically, so readers never see a partial file."""
+        path = self._path(chunk_text)
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix=".tmp")
+            try:
+                with os.fdopen(fd, "w", encoding="utf-8") as f:
+                    json.dump(clauses, f, ensure_ascii=False)
+                os.replace(tmp_path, path)
+            except BaseException:
+                os.unlink(tmp_path)
+                raise
+        except OSError as e:
+            logger.warning(f"Could not write analysis cache entry: {e}")
+
+    def set_many(self, entries: List[Tuple[str, List[ClauseDict]]]):
+        """Stores the clauses of several chunks."""
+        for chunk_text, clauses in entries:
+            self.set(chunk_text, clauses)
+
+class RateLimiter:
+    """
+    Token bucket over requests and input tokens per minute. Callers wait only
+    when the budget is exhausted, instead of sleeping blindly between requests.
+    """
+
+    def __init__(self, requests_per_minute: int, tokens_per_minute: int):
+        self.requests_per_minute = max(1, requests_per_minute)
+        self.tokens_per_minute = max(1, tokens_per_minute)
+        self._requests = float(self.requests_per_minute)
+        self._tokens = float(self.tokens_per_minute)
+        self._updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        elapsed = now - self._updated
+        self._updated = now
+        self._requests = min(self.requests_per_minute, self._requests + elapsed * self.requests_per_minute / 60)
+        self._tokens = min(self.tokens_per_minute, self._tokens + elapsed * self.tokens_per_minute / 60)
+
+    async def acquire(self, tokens: int):
+        """Wait until one request of roughly `tokens` input tokens fits in the budget."""
+        # A request larger than the whole per-minute budget still has to go through eventually
+        tokens = min(tokens, self.tokens_per_minute)
+        while True:
+            # No await between the check and the deduction, so concurrent callers cannot overdraw
+            self._refill()
+            if self._requests >= 1 and self._tokens >= tokens:
+                self._requests -= 1
+                self._tokens -= tokens
+                return
+            await asyncio.sleep(max(
+                (1 - self._requests) * 60 / self.requests_per_minute,
+                (tokens - self._tokens) * 60 / self.tokens_per_minute
+            ))
+
 # --- Analyzer Class ---
 class OptimizedLegalAnalyzer:
-    def __init__(self, model_name: str = "gemini-1.5-flash"):
-        """Initialize with the faster, cheaper Flash model"""
-        self.model = genai.GenerativeModel(model_name)
-        self.doc_processor = DocumentProcessor()
+    def __init__(self, model_name: str = "gemini-1.5-flash", max_concurrency: int = MAX_CONCURRENT_CHUNKS):
+        """
+        Initialize with the faster, cheaper Flash model.
+        max_concurrency caps the Gemini requests in flight for one document.
+        """
+        self.model_name = model_name
+        self.max_concurrency = max(1, max_concurrency)
+        self.rate_limiter = RateLimiter(GEMINI_RPM, GEMINI_TPM)
+        self.analysis_cache = ChunkAnalysisCache(model_name)
+        # The static instructions are sent as the system instruction, so each request's
+        # contents hold only the document chunks (and the static part is ready for
+        # Gemini context caching should it ever exceed the cacheable minimum)
+        self._system_instruction = self._build_system_instruction()
+        self._system_tokens = estimate_tokens(self._system_instruction)
+        # One model per event loop, see _model_for_running_loop
+        self._models: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, genai.GenerativeModel]" = (
+            weakref.WeakKeyDictionary()
+        )
+        self.doc_processor = get_document_processor()
         
         # Generation config for consistent, shorter responses
+        # and constrained decoding to RESPONSE_SCHEMA, so replies are always bare JSON
         self.generation_config = genai.types.GenerationConfig(
             temperature=0.1,
             top_p=0.8,
-            max_output_tokens=2048
+            max_output_tokens=2048 * CHUNKS_PER_REQUEST,
+            response_mime_type="application/json",
+            response_schema=RESPONSE_SCHEMA
         )
 
     # --- NECESSARY CHANGE 1: A MUCH SMARTER PROMPT ---
-    def _create_analysis_prompt(self, document_chunk: str) -> str:
-        """Create a focused prompt with clear risk definitions and examples."""
+    @staticmethod
+    @lru_cache(maxsize=1)
+    def _build_system_instruction() -> str:
+        """
+        Build the static part of the analysis prompt: role, output template, guidelines and examples.
+        Built once per process and shared by every analyzer instance.
+        """
         template = {
-            "clauses": [
+            "results": [
                 {
-                    "clause_title": "string",
-                    "clause_summary": "string",
-                    "risk_level": "HIGH|CRITICAL",
-                    "risk_explanation": "string",
-                    "page_number": 1
+                    "chunk_id": 1,
+                    "clauses": [
+                        {
+                            "clause_title": "string",
+                            "clause_summary": "string",
+                            "risk_level": "HIGH|CRITICAL",
+                            "risk_explanation": "string",
+                            "page_number": 1
+                        }
+                    ]
                 }
             ]
         }
@@ -80,6 +391,8 @@ ANALYSIS GUIDELINES:
 1.  **Focus on True Risk:** A clause is risky if it is one-sided, ambiguous, or imposes an unfair burden on one party.
 2.  **Ignore Standard Clauses:** Do NOT flag standard, mutual clauses that apply to "Either Party" (like standard termination for insolvency or basic confidentiality) unless they contain unusual, one-sided language.
 3.  **Identify 3-5 Highest Risk Clauses Only:** Be selective. Only extract HIGH or CRITICAL risk items.
+4.  **Analyze Each Chunk Separately:** Return exactly one entry in "results" per chunk, with the chunk's id as "chunk_id".
+5.  **Page Numbers:** Use the number of the "--- PAGE n ---" header the clause appears under.
 
 ---
 EXAMPLE OF A TRUE CRITICAL RISK (YOU SHOULD EXTRACT THIS):
@@ -90,103 +403,251 @@ EXAMPLE OF A FALSE POSITIVE (YOU SHOULD IGNORE THIS):
 - **Clause Text:** "Either Party may terminate this Agreement immediately upon written notice if the other Party becomes insolvent or is subject to bankruptcy proceedings."
 - **Why it's NOT Risky:** This is a STANDARD INSOLVENCY clause. It is mutual ("Either Party") and protects both sides. Do not flag it.
 ---
+"""
 
-DOCUMENT CHUNK TO ANALYZE:
----
-{document_chunk}
----
+    def _create_analysis_prompt(self, chunks: List[Tuple[int, str]]) -> str:
+        """Create a focused prompt with clear risk definitions and examples for one or more chunks."""
+        document_chunks = "\n\n".join(
+            f"<<<CHUNK id={chunk_id}>>>\n{chunk_text}\n<<<END>>>" for chunk_id, chunk_text in chunks
+        )
+        return PROMPT_HEADER + document_chunks + PROMPT_SUFFIX
 
-JSON OUTPUT:"""
+    def _model_for_running_loop(self) -> genai.GenerativeModel:
+        """The Gemini model for the running event loop, created on first use."""
+        loop = asyncio.get_running_loop()
+        model = self._models.get(loop)
+        if model is None:
+            model = genai.GenerativeModel(self.model_name, system_instruction=self._system_instruction)
+            # Left unset, the SDK gives every model its process-wide default async client, which
+            # stays bound to the first loop that used it; this loop's client is attached once here
+            model._async_client = _async_client_for_loop(loop)
+            self._models[loop] = model
+        return model
+
+    async def _generate(self, prompt: str):
+        """Call Gemini within the rate limit, backing off and retrying if it still answers 429."""
+        prompt_tokens = self._system_tokens + estimate_tokens(prompt)
+        for attempt in range(MAX_RATE_LIMIT_RETRIES + 1):
+            await self.rate_limiter.acquire(prompt_tokens)
+            try:
+                return await self._model_for_running_loop().generate_content_async(
+                    prompt,
+                    generation_config=self.generation_config
+                )
+            except google_exceptions.ResourceExhausted:
+                if attempt == MAX_RATE_LIMIT_RETRIES:
+                    raise
+                delay = RATE_LIMIT_BACKOFF_SECONDS * 2 ** attempt
+                logger.warning(f"Gemini rate limit hit, retrying in {delay:.0f}s")
+                await asyncio.sleep(delay)
+
+    def _validate_clauses(self, clauses: Any, chunk_number: int) -> List[ClauseDict]:
+        """Keep only the clauses that match the ClauseAnalysis schema, with risk_level normalized."""
+        if not isinstance(clauses, list):
+            logger.warning(f"Chunk {chunk_number}: No valid clauses found")
+            return []
+
+        # Accept case/whitespace variants of the risk level ("high", " Critical")
+        for clause in clauses:
+            if isinstance(clause, dict) and isinstance(clause.get('risk_level'), str):
+                level = clause['risk_level'].strip().upper()
+                clause['risk_level'] = RISK_LEVELS.get(level, level)
 
-    def _analyze_chunk(self, chunk_text: str, chunk_number: int) -> Dict[Any, Any]:
-        """Analyze a single chunk using direct Gemini API"""
         try:
-            prompt = self._create_analysis_prompt(chunk_text)
-            
-            logger.info(f"Analyzing chunk {chunk_number} (approx {len(chunk_text)} chars)...")
-            
-            response = self.model.generate_content(
-                prompt,
-                generation_config=self.generation_config
-            )
+            validated_clauses = _CLAUSES_ADAPTER.validate_python(clauses)
+        except ValidationError:
+            # Keep the valid clauses when only some of them are malformed
+            validated_clauses = []
+            for clause in clauses:
+                try:
+                    validated_clauses.append(_CLAUSE_ADAPTER.validate_python(clause))
+                except ValidationError as ve:
+                    logger.warning(f"Skipping invalid clause: {ve}")
+                    continue
+
+        for clause in validated_clauses:
+            clause['risk_level'] = RISK_LEVELS[clause['risk_level']]
+
+        logger.info(f"Chunk {chunk_number}: Successfully analyzed {len(validated_clauses)} clauses")
+        return validated_clauses
+
+    async def _analyze_chunks(self, chunks: List[Tuple[int, str]], semaphore: asyncio.Semaphore) -> List[Dict[str, Any]]:
+        """Analyze several chunks in a single Gemini request and split the results back per chunk"""
+        chunk_ids = [chunk_id for chunk_id, _ in chunks]
+        try:
+            prompt = self._create_analysis_prompt(chunks)
             
-            if not response.text:
-                logger.error(f"Chunk {chunk_number}: Empty response from Gemini")
-                return {}
+            async with semaphore:
+                logger.info(f"Analyzing chunks {chunk_ids} (approx {sum(len(text) for _, text in chunks)} chars)...")
+                response = await self._generate(prompt)
             
-            # Clean response text
-            response_text = response.text.strip().replace('```json', '').replace('```', '').strip()
+            response_text = response.text
+            if not response_text:
+                logger.error(f"Chunks {chunk_ids}: Empty response from Gemini")
+                return []
             
-            # Parse JSON
+            # Parse JSON; only a reply cut off at max_output_tokens can fail here
             try:
-                chunk_data = json.loads(response_text)
-                
-                if 'clauses' in chunk_data and isinstance(chunk_data['clauses'], list):
-                    validated_clauses = []
-                    for clause in chunk_data['clauses']:
-                        try:
-                            validated_clause = ClauseAnalysis(**clause)
-                            validated_clauses.append(validated_clause.model_dump())
-                        except ValidationError as ve:
-                            logger.warning(f"Skipping invalid clause: {ve}")
-                            continue
-                    
-                    chunk_data['clauses'] = validated_clauses
-                    logger.info(f"Chunk {chunk_number}: Successfully analyzed {len(validated_clauses)} clauses")
-                else:
-                    logger.warning(f"Chunk {chunk_number}: No valid clauses found")
-                    chunk_data['clauses'] = []
-                
-                return chunk_data
-                
+                response_data = _loads(response_text)
             except json.JSONDecodeError as e:
-                logger.error(f"Chunk {chunk_number}: JSON parse error - {e}")
+                logger.error(f"Chunks {chunk_ids}: JSON parse error - {e}")
                 logger.error(f"Raw response: {response_text[:500]}...")
-                return {}
+                return []
+
+            results = response_data.get('results') if isinstance(response_data, dict) else None
+            if not isinstance(results, list):
+                logger.warning(f"Chunks {chunk_ids}: Response has no 'results' list")
+                return []
+
+            chunk_texts = dict(chunks)
+            chunk_reports = []
+            for result in results:
+                if not isinstance(result, dict) or result.get('chunk_id') not in chunk_texts:
+                    logger.warning(f"Chunks {chunk_ids}: Skipping result for unknown chunk")
+                    continue
+                clauses = self._validate_clauses(result.get('clauses'), result['chunk_id'])
+                chunk_reports.append({"chunk_id": result['chunk_id'], "clauses": clauses})
+
+            # Cache writes are blocking file I/O, keep them off the event loop
+            await asyncio.get_running_loop().run_in_executor(None, self.analysis_cache.set_many, [
+                (chunk_texts[report["chunk_id"]], report["clauses"]) for report in chunk_reports
+            ])
+            return chunk_reports
                 
         except Exception as e:
-            logger.error(f"Chunk {chunk_number}: API call failed - {e}")
-            return {}
+            logger.error(f"Chunks {chunk_ids}: API call failed - {e}")
+            return []
+
+    def _load_pages(self, doc_path: str) -> List[Tuple[int, str]]:
+        """
+        Returns (page number, text) for every non-empty page. PDFs go through
+        get_page_texts, which is cached on disk and parallelized for large files.
+        """
+        if doc_path.lower().endswith(".pdf"):
+            page_texts = self.doc_processor.get_page_texts(doc_path)
+            return [(i + 1, text) for i, text in enumerate(page_texts) if text.strip()]
+
+        pages = self.doc_processor.load_document(doc_path)
+        return [(p.metadata.get('page', i + 1), p.page_content) for i, p in enumerate(pages)]
+
+    @staticmethod
+    def _iter_chunks(pages: List[Tuple[int, str]]) -> Iterator[Tuple[int, str]]:
+        """
+        Yields (first page number, chunk text) for non-overlapping chunks, each packing consecutive
+        pages up to TARGET_CHUNK_TOKENS, so short pages share a request and long pages are split
+        instead of overflowing it. Page headers inside a chunk are numbered from 1, so a chunk's
+        text (and its cache entry) does not change when pages are inserted or removed before it.
+        """
+        sections: List[str] = []
+        section_tokens = 0
+        first_page = 0
+        for page_number, page_text in pages:
+            for part in _split_page(page_text, TARGET_CHUNK_TOKENS):
+                if sections and section_tokens + estimate_tokens(part) > TARGET_CHUNK_TOKENS:
+                    yield first_page, "\n".join(sections)
+                    sections, section_tokens = [], 0
+                if not sections:
+                    first_page = page_number
+                section = f"--- PAGE {page_number - first_page + 1} ---\n{part}"
+                sections.append(section)
+                section_tokens += estimate_tokens(section)
+            if sections and _is_chunk_boundary(page_text):
+                yield first_page, "\n".join(sections)
+                sections, section_tokens = [], 0
+        if sections:
+            yield first_page, "\n".join(sections)
+
+    def _prepare_chunks(self, doc_path: str) -> Tuple[Dict[int, int], List[Dict[str, Any]], List[Tuple[int, str]]]:
+        """
+        Loads and chunks the document, serving chunks analyzed in an earlier run from the cache.
+        Returns the first page of each chunk by chunk id, the cached chunk reports and the
+        (chunk_id, text) pairs still to analyze.
+        """
+        pages = self._load_pages(doc_path)
+
+        # Chunks are filtered as the generator produces them, so only the text of
+        # chunks that will be analyzed is ever held at once
+        first_pages = {}
+        candidates = []
+        for chunk_id, (first_page, chunk_text) in enumerate(self._iter_chunks(pages), 1):
+            first_pages[chunk_id] = first_page
+            if RISK_HINTS_RE.search(chunk_text):
+                candidates.append((chunk_id, chunk_text))
+        skipped = len(first_pages) - len(candidates)
+
+        # Repeated boilerplate yields the same clauses again, so only its first occurrence is analyzed
+        duplicate_of = find_near_duplicates([chunk_text for _, chunk_text in candidates], CHUNK_DUPLICATE_THRESHOLD)
+        duplicates = sum(1 for duplicate in duplicate_of if duplicate is not None)
+
+        cached_reports = []
+        pending_chunks = []
+        for (chunk_id, chunk_text), duplicate in zip(candidates, duplicate_of):
+            if duplicate is not None:
+                continue
+            cached_clauses = self.analysis_cache.get(chunk_text)
+            if cached_clauses is None:
+                pending_chunks.append((chunk_id, chunk_text))
+            else:
+                cached_reports.append({"chunk_id": chunk_id, "clauses": cached_clauses})
+        if skipped:
+            logger.info(f"Skipped {skipped} chunk(s) with no risk-related terms")
+        if duplicates:
+            logger.info(f"Skipped {duplicates} chunk(s) duplicating an earlier chunk")
+        return first_pages, cached_reports, pending_chunks
+
+    @staticmethod
+    def _to_document_pages(report: Dict[str, Any], first_page: int) -> Dict[str, Any]:
+        """Converts a chunk report's page numbers from chunk-relative to document page numbers."""
+        return {
+            "chunk_id": report["chunk_id"],
+            "clauses": [
+                {**clause, "page_number": clause["page_number"] + first_page - 1}
+                for clause in report["clauses"]
+            ]
+        }
 
     def analyze_document(self, doc_path: str) -> Dict[str, Any]:
         """Main analysis function with optimized chunking"""
+        return _run_on_sync_loop(self.aanalyze_document(doc_path))
+
+    async def aanalyze_document(self, doc_path: str) -> Dict[str, Any]:
+        """
+        Async version of analyze_document. All chunks are sent to Gemini concurrently,
+        with at most max_concurrency requests in flight.
+        """
         if not os.path.exists(doc_path):
             raise FileNotFoundError(f"{doc_path} not found.")
         
         logger.info(f"Loading document: {doc_path}")
-        pages = self.doc_processor.load_document(doc_path)
-        
-        # Create overlapping 2-page chunks with 1-page overlap
-        chunks = []
-        for i in range(0, len(pages), 1):
-            chunk_end = min(i + 2, len(pages))
-            chunk_pages = pages[i:chunk_end]
-            
-            if len(chunk_pages) == 1 and i > 0:
-                continue
-                
-            chunk_text = "\n".join([
-                f"--- PAGE {p.metadata.get('page', i+j+1)} ---\n{p.page_content}"
-                for j, p in enumerate(chunk_pages)
-            ])
-            chunks.append(chunk_text)
-            
-            if chunk_end >= len(pages):
-                break
-        
-        logger.info(f"Document split into {len(chunks)} overlapping chunk(s) of up to 2 pages each.")
-        
-        successful_reports = []
-        for idx, chunk in enumerate(chunks):
-            chunk_result = self._analyze_chunk(chunk, idx + 1)
-            
-            if chunk_result and 'clauses' in chunk_result:
-                successful_reports.append(chunk_result)
-            
-            if idx < len(chunks) - 1:
-                time.sleep(2)
+        # Text extraction and cache lookups are blocking file I/O, keep them off the event loop
+        first_pages, successful_reports, numbered_chunks = await asyncio.get_running_loop().run_in_executor(
+            None, self._prepare_chunks, doc_path
+        )
+        logger.info(f"Document split into {len(first_pages)} chunk(s) of up to {TARGET_CHUNK_TOKENS} tokens each.")
+        if successful_reports:
+            logger.info(f"{len(successful_reports)} chunk(s) served from the analysis cache")
+
+        # Several chunks share each request, cutting the number of API calls
+        batches = [
+            numbered_chunks[i:i + CHUNKS_PER_REQUEST]
+            for i in range(0, len(numbered_chunks), CHUNKS_PER_REQUEST)
+        ]
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        batch_results = await asyncio.gather(*(self._analyze_chunks(batch, semaphore) for batch in batches))
+        successful_reports.extend(chunk_report for batch_result in batch_results for chunk_report in batch_result)
+        successful_reports.sort(key=lambda report: report["chunk_id"])
+        successful_reports = [
+            self._to_document_pages(report, first_pages[report["chunk_id"]]) for report in successful_reports
+        ]
         
         if not successful_reports:
+            # Nothing was sent to Gemini (no text, or every chunk was filtered out); that is not
+            # evidence the document is risk-free, so it is not reported as a clean analysis
+            if not numbered_chunks:
+                return {
+                    "error": "No chunks analyzed: the document has no extractable text or no risk-related terms.",
+                    "chunks_analyzed": 0
+                }
             return {"error": "All chunk analyses failed. Check your API quota and document format."}
         
         logger.info(f"Aggregating {len(successful_reports)} successful chunk(s)...")
@@ -198,33 +659,35 @@ JSON OUTPUT:"""
             return {"error": "No reports to aggregate"}
         
         try:
-            all_clauses = []
+            # Rank keys are computed once per clause: (priority, page, arrival order, clause)
+            candidates = []
             seen_clauses = set()
+            risk_priority = RISK_PRIORITY.get
+            all_clauses = itertools.chain.from_iterable(
+                report.get("clauses") if isinstance(report.get("clauses"), list) else ()
+                for report in reports
+            )
             
-            for report in reports:
-                clauses = report.get("clauses", [])
-                if isinstance(clauses, list):
-                    for clause in clauses:
-                        # --- NECESSARY CHANGE 2: MORE ROBUST DE-DUPLICATION LOGIC ---
-                        # Use the summary for de-duplication, as titles can be inconsistent.
-                        summary_start = clause.get('clause_summary', '').lower().strip()[:100]
-                        clause_signature = (
-                            summary_start,
-                            clause.get('page_number', 0)
-                        )
-                        
-                        risk_level = clause.get('risk_level', '').upper()
-                        if risk_level in ['HIGH', 'CRITICAL'] and clause_signature not in seen_clauses:
-                            seen_clauses.add(clause_signature)
-                            all_clauses.append(clause)
-            
-            priority_order = {'CRITICAL': 0, 'HIGH': 1}
-            all_clauses.sort(key=lambda x: (
-                priority_order.get(x.get('risk_level', '').upper(), 2),
-                x.get('page_number', 0)
-            ))
+            for clause in all_clauses:
+                priority = risk_priority(clause.get('risk_level'))
+                if priority is None:
+                    continue
+
+                # --- NECESSARY CHANGE 2: MORE ROBUST DE-DUPLICATION LOGIC ---
+                # Use the summary for de-duplication, as titles can be inconsistent.
+                # Only a 64-bit fingerprint of the signature is kept in the set.
+                page_number = clause.get('page_number', 0)
+                # Lowercase only the 100-character prefix, not the whole summary
+                summary_start = clause.get('clause_summary', '').strip()[:100].lower()
+                clause_signature = hash((summary_start, page_number))
+                
+                if clause_signature not in seen_clauses:
+                    seen_clauses.add(clause_signature)
+                    candidates.append((priority, page_number, len(candidates), clause))
             
-            top_clauses = all_clauses[:6]
+            # Only the top 6 are needed, so select them without sorting everything;
+            # arrival order breaks ties, so clause dicts are never compared
+            top_clauses = [clause for _, _, _, clause in heapq.nsmallest(6, candidates)]
             
             overall_summary = self._generate_comprehensive_summary(reports, top_clauses)
             
@@ -251,37 +714,44 @@ JSON OUTPUT:"""
         doc_title = "Legal Document"
         doc_type = "Contract"
 
-        risk_counts = {}
-        for clause in clauses:
-            level = clause.get("risk_level", "UNKNOWN").upper()
-            risk_counts[level] = risk_counts.get(level, 0) + 1
+        # Risk levels are the interned constants set at parse time
+        risk_counts = Counter(clause.get("risk_level") for clause in clauses)
+        critical_count = risk_counts[RISK_CRITICAL]
+        high_count = risk_counts[RISK_HIGH]
         
-        summary_parts = [
-            f"Document Analysis: {doc_title} ({doc_type})"
-        ]
+        summary = f"Document Analysis: {doc_title} ({doc_type})"
         
-        if risk_counts:
-            risk_desc = []
-            if 'CRITICAL' in risk_counts:
-                risk_desc.append(f"{risk_counts['CRITICAL']} critical")
-            if 'HIGH' in risk_counts:
-                risk_desc.append(f"{risk_counts['HIGH']} high-risk")
-            
-            if risk_desc:
-                summary_parts.append(f"Identified {len(clauses)} concerning clauses: {', '.join(risk_desc)}.")
+        if critical_count and high_count:
+            summary += f" Identified {len(clauses)} concerning clauses: {critical_count} critical, {high_count} high-risk."
+        elif critical_count:
+            summary += f" Identified {len(clauses)} concerning clauses: {critical_count} critical."
+        elif high_count:
+            summary += f" Identified {len(clauses)} concerning clauses: {high_count} high-risk."
         
-        critical_count = risk_counts.get("CRITICAL", 0)
         if critical_count > 0:
-            summary_parts.append("This document contains critical issues requiring immediate legal review and likely negotiation before signing.")
+            summary += " This document contains critical issues requiring immediate legal review and likely negotiation before signing."
         elif len(clauses) > 3:
-            summary_parts.append("Multiple high-risk elements present - recommend thorough legal review before proceeding.")
+            summary += " Multiple high-risk elements present - recommend thorough legal review before proceeding."
         else:
-            summary_parts.append("Document contains some concerning provisions that should be reviewed with legal counsel.")
+            summary += " Document contains some concerning provisions that should be reviewed with legal counsel."
         
-        return " ".join(summary_parts)
+        return summary
 
 # --- Main Function ---
-def main():
+def _dumps_report(report: Dict[str, Any]) -> str:
+    """Serialize a report as indented JSON, with orjson when it is installed."""
+    if orjson is not None:
+        return orjson.dumps(report, option=orjson.OPT_INDENT_2).decode("utf-8")
+    return json.dumps(report, indent=2, ensure_ascii=False)
+
+
+def _save_report(report_json: str, outfile: str):
+    """Write a serialized report to disk."""
+    with open(outfile, "w", encoding="utf-8") as f:
+        f.write(report_json)
+
+
+async def main():
     # IMPORTANT: Replace this with the actual path to your document
     doc_path = r"E:\SUMGRIND\SAMPLE LEGAL DOCS\sample_service_agreement_test.pdf"
     
@@ -293,7 +763,7 @@ def main():
         analyzer = OptimizedLegalAnalyzer()
         logger.info("Starting optimized document analysis...")
         
-        report = analyzer.analyze_document(doc_path)
+        report = await analyzer.aanalyze_document(doc_path)
         
         print("\n" + "="*80)
         print("OPTIMIZED LEGAL DOCUMENT ANALYSIS REPORT")
@@ -304,20 +774,23 @@ def main():
             if "partial_data" in report:
                 print(f"Partial data available for {len(report['partial_data'])} chunks")
         else:
-            print(json.dumps(report, indent=2, ensure_ascii=False))
+            report_json = _dumps_report(report)
             
             timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
             outfile = f"legal_report_fast_{timestamp}.json"
             
-            with open(outfile, "w", encoding="utf-8") as f:
-                json.dump(report, f, indent=2, ensure_ascii=False)
+            # Save in the background while the report is printed
+            save_task = asyncio.get_running_loop().run_in_executor(None, _save_report, report_json, outfile)
             
-            print(f"\n✅ Report saved as {outfile}")
+            print(report_json)
             print(f"📊 High-risk clauses analyzed: {len(report.get('clauses', []))}")
+            
+            await save_task
+            print(f"\n✅ Report saved as {outfile}")
     
     except Exception as e:
         logger.error(f"Analysis failed: {e}")
         print(f"❌ Analysis failed: {e}")
 
 if __name__ == "__main__":
-    main()
+    asyncio.run(main())
@@ -1,12 +1,12 @@
 
 import sys
-import json
+from wrapper_utils import print_json
 import os
 from chatbot import LegalDocumentChatbot
 
 def main():
     if len(sys.argv) != 4:
-        print(json.dumps({"success": False, "error": "Message, document ID, and mode required"}))
+        print_json({"success": False, "error": "Message, document ID, and mode required"})
         sys.exit(1)
     
     message = sys.argv[1]
@@ -37,7 +37,7 @@ def main():
             "sources": [],
             "mode": mode
         }
-        print(json.dumps(result))
+        print_json(result)
         
     except Exception as e:
         result = {
@@ -45,7 +45,7 @@ def main():
             "error": str(e),
             "response": "I apologize, but I'm having trouble processing your request right now. Please try again later."
         }
-        print(json.dumps(result))
+        print_json(result)
         sys.exit(1)
 
 if __name__ == "__main__":
@@ -1,12 +1,12 @@
 
 import sys
-import json
 import os
+from wrapper_utils import print_json
 from doc_classification import DocumentClassifier
 
 def main():
     if len(sys.argv) != 2:
-        print(json.dumps({"success": False, "error": "File path required"}))
+        print_json({"success": False, "error": "File path required"})
         sys.exit(1)
     
     file_path = sys.argv[1]
@@ -19,14 +19,14 @@ def main():
             "success": True,
             "classification": classification
         }
-        print(json.dumps(result))
+        print_json(result)
         
     except Exception as e:
         result = {
             "success": False,
             "error": str(e)
         }
-        print(json.dumps(result))
+        print_json(result)
         sys.exit(1)
 
 if __name__ == "__main__":
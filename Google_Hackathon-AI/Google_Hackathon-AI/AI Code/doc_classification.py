@@ -1,8 +1,12 @@
 import os
+import json
 import logging
-from typing import Optional
+import mmap
+import re
+from functools import lru_cache
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set, Tuple
 from pathlib import Path
-from utils import DocumentProcessor
+from utils import get_document_processor, get_embedding_manager, get_llm_cache, normalize_whitespace, truncate_to_tokens
 
 # Load environment variables
 try:
@@ -53,6 +57,60 @@ CATEGORY_GUIDELINES = """
 - OTHERS: Anything else (newsletters, opinions, academic or training docs).
 """
 
+# Per-category descriptions used for embedding-based (zero-shot) classification
+CATEGORY_DESCRIPTIONS = {
+    "TRANSACTIONAL": "Contracts, leases, employment offers, service, purchase and sale agreements between private parties.",
+    "DISPUTES": "Litigation, arbitration, lawsuits, court orders, complaints, judgments between plaintiffs and defendants.",
+    "CORPORATE": "Internal corporate governance documents such as incorporation papers, bylaws, board resolutions and shareholder agreements.",
+    "REGULATORY": "Statutory filings, permits, licenses and compliance documents submitted to regulators or government agencies.",
+    "INTELLECTUAL_PROPERTY": "Patents, trademarks, copyrights, trade secrets and intellectual property agreements.",
+    "OTHERS": "Newsletters, legal opinions, academic articles, training material and other general documents.",
+}
+
+# Keywords for the rule-based fallback classifier; on a tie the earlier category wins
+CATEGORY_KEYWORDS = {
+    'TRANSACTIONAL': ['contract', 'agreement', 'lease', 'employment', 'service', 'purchase', 'sale', 'rental', 'vendor', 'supplier'],
+    'DISPUTES': ['lawsuit', 'litigation', 'court', 'plaintiff', 'defendant', 'judgment', 'dispute', 'arbitration', 'mediation', 'settlement'],
+    'CORPORATE': ['incorporation', 'bylaws', 'board', 'shareholder', 'resolution', 'articles', 'charter', 'governance', 'director'],
+    'REGULATORY': ['permit', 'license', 'compliance', 'regulatory', 'filing', 'regulation', 'statute', 'code', 'ordinance'],
+    'INTELLECTUAL_PROPERTY': ['patent', 'trademark', 'copyright', 'intellectual', 'ip', 'invention', 'design', 'trade secret'],
+}
+_KEYWORD_CATEGORY = {word: category for category, words in CATEGORY_KEYWORDS.items() for word in words}
+
+# Every keyword in one automaton; the lookahead reports matches at every position, overlapping ones included
+_KEYWORD_RE = re.compile(
+    "(?=(" + "|".join(re.escape(word) for word in sorted(_KEYWORD_CATEGORY, key=len, reverse=True)) + "))"
+)
+
+# The keywords are ASCII, so plain-text files are scanned as raw bytes: bytes.lower() only
+# folds A-Z, which is all the match needs, and nothing is decoded into str
+_KEYWORD_BYTES_RE = re.compile(_KEYWORD_RE.pattern.encode("ascii"))
+_MAX_KEYWORD_LENGTH = max(len(word) for word in _KEYWORD_CATEGORY)
+
+# Bytes of a memory-mapped text file lowercased and scanned at a time
+TEXT_SCAN_BLOCK_BYTES = 1 << 20
+
+# The keyword scan stops early once a category has this many distinct keywords
+# and leads every other category by at least the margin
+KEYWORD_EARLY_EXIT_SCORE = 6
+KEYWORD_EARLY_EXIT_MARGIN = 3
+
+# Token budget for the document excerpt sent to the classifiers
+CLASSIFICATION_MAX_TOKENS = 1500
+
+# Documents classified per Gemini request by classify_documents; with excerpts capped at
+# CLASSIFICATION_MAX_TOKENS a full batch stays far below the model's context window
+CLASSIFICATION_BATCH_SIZE = 8
+
+# Minimum similarity lead of the best category over the runner-up before trusting embeddings
+EMBEDDING_MIN_MARGIN = 0.05
+
+# Gemini clients created by get_gemini_llm, keyed by API key
+_LLM_INSTANCES: Dict[str, Any] = {}
+
+# Category description embeddings, computed once per embedding model
+_CATEGORY_VECTORS: Dict[str, List[List[float]]] = {}
+
 # Simple classification prompt template
 CLASSIFICATION_PROMPT = """
 You are a legal document classifier. Analyze the following document text and classify it into exactly ONE of these categories:
@@ -62,35 +120,86 @@ You are a legal document classifier. Analyze the following document text and cla
 Classification Guidelines:
 {guidelines}
 
-Document Text (first 3000 characters):
+Document Text (beginning of document):
 {document_text}
 
 Respond with exactly ONE WORD from the categories list above. No explanation needed.
 Classification:
 """
 
+# Batch variant: several documents per request, answered as a JSON array
+BATCH_CLASSIFICATION_PROMPT = """
+You are a legal document classifier. Analyze each of the following documents and classify each one into exactly ONE of these categories:
+
+{categories}
+
+Classification Guidelines:
+{guidelines}
+
+Documents (beginning of each document):
+{documents}
+
+Respond with only a JSON array holding one object per document, like [{{"id": 1, "category": "DISPUTES"}}]. No explanation needed.
+"""
+
+_JSON_ARRAY_RE = re.compile(r"\[.*\]", re.DOTALL)
+
+def _document_excerpt(document_text: str) -> str:
+    """Whitespace-normalized opening of the document, bounded to CLASSIFICATION_MAX_TOKENS."""
+    return truncate_to_tokens(normalize_whitespace(document_text), CLASSIFICATION_MAX_TOKENS)
+
+# Characters of the document opening handed to the classifiers, before normalization
+_OPENING_CHARS = CLASSIFICATION_MAX_TOKENS * 4 * 2
+
+def _opening_text(pages: Iterable[str]) -> str:
+    """
+    Joins only as many leading pages as the classifier excerpt can use
+    (with headroom for whitespace normalization), instead of the whole document.
+    """
+    budget = _OPENING_CHARS
+    parts = []
+    length = 0
+    for page in pages:
+        parts.append(page)
+        length += len(page) + 1
+        if length >= budget:
+            break
+    return "\n".join(parts)
+
+@lru_cache(maxsize=1)
+def _load_api_key() -> Optional[str]:
+    """
+    Resolves the Gemini API key once per process: environment first, then the
+    parent directory .env. The key is exported as GOOGLE_API_KEY for the Google clients.
+    """
+    # Try multiple ways to get the API key
+    gemini_api_key = (
+        os.getenv("GEMINI_API_KEY") or 
+        os.getenv("GOOGLE_API_KEY") or
+        None
+    )
+    
+    # If still no key, try loading from parent directory .env
+    if not gemini_api_key:
+        try:
+            env_path = Path(__file__).parent.parent.parent.parent / ".env"
+            if env_path.exists():
+                with open(env_path, 'r') as f:
+                    for line in f:
+                        if line.startswith('GEMINI_API_KEY='):
+                            gemini_api_key = line.split('=', 1)[1].strip()
+                            break
+        except Exception as e:
+            logger.debug(f"Could not read .env file: {e}")
+    
+    if gemini_api_key:
+        os.environ["GOOGLE_API_KEY"] = gemini_api_key
+    return gemini_api_key
+
 def get_gemini_llm():
     """Initialize Gemini LLM with error handling."""
     try:
-        # Try multiple ways to get the API key
-        gemini_api_key = (
-            os.getenv("GEMINI_API_KEY") or 
-            os.getenv("GOOGLE_API_KEY") or
-            None
-        )
-        
-        # If still no key, try loading from parent directory .env
-        if not gemini_api_key:
-            try:
-                env_path = Path(__file__).parent.parent.parent.parent / ".env"
-                if env_path.exists():
-                    with open(env_path, 'r') as f:
-                        for line in f:
-                            if line.startswith('GEMINI_API_KEY='):
-                                gemini_api_key = line.split('=', 1)[1].strip()
-                                break
-            except Exception as e:
-                logger.debug(f"Could not read .env file: {e}")
+        gemini_api_key = _load_api_key()
         
         if not gemini_api_key:
             logger.warning("GEMINI_API_KEY not found in environment variables")
@@ -100,16 +209,19 @@ def get_gemini_llm():
             logger.warning("LangChain Google GenAI not available")
             return None
         
-        # Set environment variable for Google API
-        os.environ["GOOGLE_API_KEY"] = gemini_api_key
+        # Reuse the client (and its open connections) built for this key earlier
+        if gemini_api_key in _LLM_INSTANCES:
+            return _LLM_INSTANCES[gemini_api_key]
         
         # Try to create the LLM instance
         llm = ChatGoogleGenerativeAI(
             model="gemini-1.5-flash",  # Updated model name
             temperature=0,
-            google_api_key=gemini_api_key
+            google_api_key=gemini_api_key,
+            cache=get_llm_cache()  # Re-classifying the same text skips the API call
         )
         
+        _LLM_INSTANCES[gemini_api_key] = llm
         logger.info("Gemini LLM initialized successfully")
         return llm
         
@@ -121,31 +233,50 @@ def classify_document_simple(document_text: str) -> str:
     """Simple rule-based classification as fallback."""
     if not document_text or not document_text.strip():
         return "OTHERS"
-        
-    text_lower = document_text.lower()
-    
-    # Enhanced keyword-based classification with more keywords
-    transactional_keywords = ['contract', 'agreement', 'lease', 'employment', 'service', 'purchase', 'sale', 'rental', 'vendor', 'supplier']
-    disputes_keywords = ['lawsuit', 'litigation', 'court', 'plaintiff', 'defendant', 'judgment', 'dispute', 'arbitration', 'mediation', 'settlement']
-    corporate_keywords = ['incorporation', 'bylaws', 'board', 'shareholder', 'resolution', 'articles', 'charter', 'governance', 'director']
-    regulatory_keywords = ['permit', 'license', 'compliance', 'regulatory', 'filing', 'regulation', 'statute', 'code', 'ordinance']
-    ip_keywords = ['patent', 'trademark', 'copyright', 'intellectual', 'ip', 'invention', 'design', 'trade secret']
-    
-    # Count keyword matches for more accurate classification
-    transactional_score = sum(1 for word in transactional_keywords if word in text_lower)
-    disputes_score = sum(1 for word in disputes_keywords if word in text_lower)
-    corporate_score = sum(1 for word in corporate_keywords if word in text_lower)
-    regulatory_score = sum(1 for word in regulatory_keywords if word in text_lower)
-    ip_score = sum(1 for word in ip_keywords if word in text_lower)
-    
-    # Return category with highest score
-    scores = {
-        'TRANSACTIONAL': transactional_score,
-        'DISPUTES': disputes_score,
-        'CORPORATE': corporate_score,
-        'REGULATORY': regulatory_score,
-        'INTELLECTUAL_PROPERTY': ip_score
-    }
+    return classify_pages_simple([document_text])
+
+def classify_pages_simple(pages: Iterable[str]) -> str:
+    """Rule-based classification over a document's pages, lowercasing one page at a time."""
+    return _classify_keyword_matches(
+        (match.group(1) for match in _KEYWORD_RE.finditer(page.lower())) for page in pages
+    )
+
+def classify_text_file_simple(file_path: str) -> str:
+    """
+    Rule-based classification of a plain-text file. The file is memory-mapped and scanned
+    block by block, so it is never read into a Python string.
+    """
+    with open(file_path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return "OTHERS"
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            # Blocks overlap by a keyword length so matches straddling a boundary are kept
+            blocks = (
+                mm[start:start + TEXT_SCAN_BLOCK_BYTES + _MAX_KEYWORD_LENGTH - 1].lower()
+                for start in range(0, len(mm), TEXT_SCAN_BLOCK_BYTES)
+            )
+            return _classify_keyword_matches(
+                (match.group(1).decode("ascii") for match in _KEYWORD_BYTES_RE.finditer(block)) for block in blocks
+            )
+
+def _classify_keyword_matches(segments: Iterable[Iterable[str]]) -> str:
+    """
+    Category with the most distinct keywords, given the keyword matches of each page (or block)
+    in order; OTHERS if none matched. Segments are consumed lazily, so later ones are never
+    scanned once a category clearly leads.
+    """
+    # Score = number of distinct keywords present
+    found: Set[str] = set()
+    scores = {category: 0 for category in CATEGORY_KEYWORDS}
+    for matches in segments:
+        for word in matches:
+            if word not in found:
+                found.add(word)
+                scores[_KEYWORD_CATEGORY[word]] += 1
+        # Remaining segments cannot realistically change a clear winner, so stop scanning
+        leader, runner_up = sorted(scores.values(), reverse=True)[:2]
+        if leader >= KEYWORD_EARLY_EXIT_SCORE and leader - runner_up >= KEYWORD_EARLY_EXIT_MARGIN:
+            break
     
     max_score = max(scores.values())
     if max_score > 0:
@@ -155,32 +286,91 @@ def classify_document_simple(document_text: str) -> str:
     
     return "OTHERS"
 
-def classify_document_with_ai(document_text: str) -> str:
-    """AI-powered classification using Gemini."""
+def classify_document_with_embeddings(document_text: str) -> Optional[str]:
+    """
+    Zero-shot classification by similarity between the document and each category description.
+    Returns None when embeddings are unavailable or the top two categories are too close to call.
+    """
+    try:
+        manager = get_embedding_manager()
+        if not manager.is_available():
+            return None
+
+        embeddings = manager.get_embeddings()
+        if manager.model_name not in _CATEGORY_VECTORS:
+            _CATEGORY_VECTORS[manager.model_name] = embeddings.embed_documents(
+                [CATEGORY_DESCRIPTIONS[category] for category in CATEGORIES]
+            )
+
+        # Embeddings are normalized, so the dot product is the cosine similarity
+        query = embeddings.embed_query(_document_excerpt(document_text))
+        scores = [
+            sum(q * c for q, c in zip(query, vector))
+            for vector in _CATEGORY_VECTORS[manager.model_name]
+        ]
+        ranked = sorted(zip(scores, CATEGORIES), reverse=True)
+        (best_score, best_category), (runner_up_score, _) = ranked[0], ranked[1]
+
+        if best_score - runner_up_score < EMBEDDING_MIN_MARGIN:
+            logger.info(f"Embedding classification ambiguous ({best_score:.3f} vs {runner_up_score:.3f})")
+            return None
+
+        logger.info(f"Embedding classification successful: {best_category}")
+        return best_category
+
+    except Exception as e:
+        logger.warning(f"Embedding classification failed: {str(e)}")
+        return None
+
+@lru_cache(maxsize=1)
+def _get_classification_chain():
+    """
+    Builds the classification chain once. The categories and guidelines are constant,
+    so they are bound with partial() and only document_text is formatted per call.
+    Only called after get_gemini_llm() has returned a client.
+    """
+    prompt_template = PromptTemplate(
+        input_variables=["categories", "guidelines", "document_text"],
+        template=CLASSIFICATION_PROMPT
+    ).partial(categories=", ".join(CATEGORIES), guidelines=CATEGORY_GUIDELINES)
+    return prompt_template | get_gemini_llm() | StrOutputParser()
+
+@lru_cache(maxsize=1)
+def _get_batch_classification_chain():
+    """Builds the multi-document classification chain once, like _get_classification_chain."""
+    prompt_template = PromptTemplate(
+        input_variables=["categories", "guidelines", "documents"],
+        template=BATCH_CLASSIFICATION_PROMPT
+    ).partial(categories=", ".join(CATEGORIES), guidelines=CATEGORY_GUIDELINES)
+    return prompt_template | get_gemini_llm() | StrOutputParser()
+
+def classify_document_with_ai(document_text: str, fallback: Optional[Callable[[], str]] = None) -> str:
+    """
+    AI-powered classification using Gemini. document_text only needs to hold the opening
+    of the document; fallback, if given, classifies the whole document by rules instead.
+    """
+    classification = _classify_with_ai(document_text)
+    if classification is not None:
+        return classification
+    if fallback is None:
+        return classify_document_simple(document_text)
+    return fallback()
+
+def _classify_with_ai(document_text: str) -> Optional[str]:
+    """Gemini's classification of the document, or None if Gemini is unavailable or failed."""
     try:
         llm = get_gemini_llm()
         if llm is None:
             logger.warning("LLM not available, using simple classification")
-            return classify_document_simple(document_text)
+            return None
         
         if PromptTemplate is None or StrOutputParser is None:
             logger.warning("LangChain components not available, using simple classification")
-            return classify_document_simple(document_text)
-        
-        # Create prompt
-        prompt_template = PromptTemplate(
-            input_variables=["categories", "guidelines", "document_text"],
-            template=CLASSIFICATION_PROMPT
-        )
-        
-        # Create chain
-        chain = prompt_template | llm | StrOutputParser()
+            return None
         
         # Run classification
-        result = chain.invoke({
-            "categories": ", ".join(CATEGORIES),
-            "guidelines": CATEGORY_GUIDELINES,
-            "document_text": document_text[:3000]  # Limit text length
+        result = _get_classification_chain().invoke({
+            "document_text": _document_excerpt(document_text)  # Token-bounded excerpt
         })
         
         # Clean and validate result
@@ -194,44 +384,103 @@ def classify_document_with_ai(document_text: str) -> str:
             
     except Exception as e:
         logger.error(f"AI classification failed: {str(e)}")
-        return classify_document_simple(document_text)
+        return None
+
+def _classify_batch_with_ai(document_texts: List[str]) -> List[Optional[str]]:
+    """
+    Classifies several documents with a single Gemini request. Returns one category per
+    document, or None for documents the response did not classify (or if the call failed).
+    """
+    unclassified = [None] * len(document_texts)
+    llm = get_gemini_llm()
+    if llm is None or PromptTemplate is None or StrOutputParser is None:
+        logger.warning("LLM not available, using simple classification")
+        return unclassified
 
-def classify_document(file_path: str) -> str:
-    """Main classification function that handles any supported file type."""
     try:
-        logger.info(f"Starting classification for document: {file_path}")
-        
-        # Check if file exists
-        if not os.path.exists(file_path):
-            logger.error(f"File not found: {file_path}")
-            return "OTHERS"
-        
-        # Validate file type
-        file_extension = Path(file_path).suffix.lower()
-        supported_extensions = {'.pdf', '.txt', '.doc', '.docx'}
-        if file_extension not in supported_extensions:
-            logger.error(f"Unsupported file type: {file_extension}")
-            return "OTHERS"
-        
-        # Load document
-        processor = DocumentProcessor()
-        documents = processor.load_document(file_path)
-        
-        if not documents:
-            logger.error("No content found in document")
-            return "OTHERS"
-        
-        # Combine all text
-        full_text = "\n".join([doc.page_content for doc in documents if doc.page_content])
+        documents = "\n".join(
+            f"--- DOCUMENT {doc_id} ---\n{_document_excerpt(text)}"  # Token-bounded excerpts
+            for doc_id, text in enumerate(document_texts, 1)
+        )
+        result = _get_batch_classification_chain().invoke({"documents": documents})
+
+        # The array may come wrapped in a markdown code fence
+        match = _JSON_ARRAY_RE.search(result)
+        items = json.loads(match.group(0)) if match else []
+        categories = {}
+        for item in items:
+            if isinstance(item, dict):
+                category = str(item.get("category", "")).strip().upper()
+                if category in CATEGORIES:
+                    categories[str(item.get("id"))] = category
+
+        classifications = [categories.get(str(doc_id)) for doc_id in range(1, len(document_texts) + 1)]
+        logger.info(f"AI batch classification: {len(categories)}/{len(document_texts)} documents classified")
+        return classifications
+
+    except Exception as e:
+        logger.error(f"AI batch classification failed: {str(e)}")
+        return unclassified
+
+def _load_classification_input(file_path: str) -> Optional[Tuple[str, Callable[[], str]]]:
+    """
+    Loads what the classifiers need from a document: its opening text and a rule-based
+    fallback over the whole document. Returns None if the document cannot be classified.
+    """
+    # Check if file exists
+    if not os.path.exists(file_path):
+        logger.error(f"File not found: {file_path}")
+        return None
+    
+    # Validate file type
+    file_extension = Path(file_path).suffix.lower()
+    supported_extensions = {'.pdf', '.txt', '.doc', '.docx'}
+    if file_extension not in supported_extensions:
+        logger.error(f"Unsupported file type: {file_extension}")
+        return None
+    
+    # Plain text is classified from its opening and a byte scan, without loading the file
+    if file_extension == '.txt':
+        with open(file_path, 'r', encoding='utf-8', errors='replace') as f:
+            opening_text = f.read(_OPENING_CHARS)
         
-        if len(full_text.strip()) == 0:
+        if not opening_text.strip():
             logger.error("Document contains no readable text")
-            return "OTHERS"
+            return None
         
-        logger.info(f"Document loaded successfully, text length: {len(full_text)}")
+        logger.info(f"Document loaded successfully, file size: {os.path.getsize(file_path)} bytes")
+        return opening_text, lambda: classify_text_file_simple(file_path)
+    
+    # The classifiers only read the opening of the document, so pages are streamed and
+    # extraction stops once the opening is collected; the rule-based fallback streams
+    # the document again and stops as soon as one category clearly leads
+    processor = get_document_processor()
+    documents = processor.stream_document(file_path)
+    try:
+        opening_text = _opening_text(doc.page_content for doc in documents)
+    finally:
+        documents.close()
+    
+    if not opening_text.strip():
+        logger.error("Document contains no readable text")
+        return None
+    
+    logger.info(f"Document opening loaded successfully, text length: {len(opening_text)}")
+    return opening_text, lambda: classify_pages_simple(
+        doc.page_content for doc in processor.stream_document(file_path)
+    )
+
+def classify_document(file_path: str) -> str:
+    """Main classification function that handles any supported file type."""
+    try:
+        logger.info(f"Starting classification for document: {file_path}")
         
-        # Try AI classification first, fallback to simple
-        classification = classify_document_with_ai(full_text)
+        # An unchanged file (same path, mtime and size) is only classified once per process
+        stat = os.stat(file_path)
+        try:
+            classification = _classify_file_version(os.path.abspath(file_path), stat.st_mtime_ns, stat.st_size)
+        except _ClassificationFallback as fallback:
+            classification = fallback.classification
         logger.info(f"Classification result: {classification}")
         return classification
         
@@ -240,12 +489,87 @@ def classify_document(file_path: str) -> str:
         logger.exception("Full error traceback:")
         return "OTHERS"
 
+class _ClassificationFallback(Exception):
+    """Carries the rule-based category when neither embeddings nor Gemini classified a file."""
+
+    def __init__(self, classification: str):
+        super().__init__(classification)
+        self.classification = classification
+
+@lru_cache(maxsize=256)
+def _classify_file_version(file_path: str, mtime_ns: int, size: int) -> str:
+    """
+    Classifies one version of a file. Errors, and rule-based results used because Gemini
+    was unavailable (raised as _ClassificationFallback), are not memoized, so a later call
+    tries again.
+    """
+    # Results are also kept on disk, so other processes (one per wrapper call) reuse them
+    processor = get_document_processor()
+    classification = processor.get_file_metadata(file_path, "classification")
+    if classification in CATEGORIES:
+        return classification
+    
+    classification_input = _load_classification_input(file_path)
+    if classification_input is None:
+        return "OTHERS"
+    opening_text, fallback = classification_input
+    
+    # Try embedding classification first, escalate to AI (then simple) when it is unsure
+    classification = classify_document_with_embeddings(opening_text)
+    if classification is None:
+        classification = _classify_with_ai(opening_text)
+    if classification is None:
+        raise _ClassificationFallback(fallback())
+    processor.set_file_metadata(file_path, "classification", classification)
+    return classification
+
+def classify_documents(file_paths: List[str]) -> List[str]:
+    """
+    Classifies several documents, returning their categories in order. Documents the
+    embeddings cannot decide are sent to Gemini together, CLASSIFICATION_BATCH_SIZE per
+    request, instead of one request per document.
+    """
+    classifications = ["OTHERS"] * len(file_paths)
+    undecided = []  # (position, opening text, rule-based fallback)
+    
+    for position, file_path in enumerate(file_paths):
+        try:
+            logger.info(f"Starting classification for document: {file_path}")
+            classification_input = _load_classification_input(file_path)
+            if classification_input is None:
+                continue
+            opening_text, fallback = classification_input
+            
+            classification = classify_document_with_embeddings(opening_text)
+            if classification is None:
+                undecided.append((position, opening_text, fallback))
+            else:
+                classifications[position] = classification
+        except Exception as e:
+            logger.error(f"Document processing failed for {file_path}: {str(e)}")
+    
+    for start in range(0, len(undecided), CLASSIFICATION_BATCH_SIZE):
+        batch = undecided[start:start + CLASSIFICATION_BATCH_SIZE]
+        if len(batch) == 1:
+            position, opening_text, fallback = batch[0]
+            classifications[position] = classify_document_with_ai(opening_text, fallback)
+            continue
+        
+        ai_classifications = _classify_batch_with_ai([opening_text for _, opening_text, _ in batch])
+        for (position, _, fallback), classification in zip(batch, ai_classifications):
+            classifications[position] = classification if classification is not None else fallback()
+    
+    logger.info(f"Classified {len(file_paths)} documents")
+    return classifications
+
 # --- DocumentClassifier Class for Wrapper Compatibility --- #
 class DocumentClassifier:
     """Document classifier with improved error handling and logging."""
     
     def __init__(self):
         self.logger = logging.getLogger(f"{__name__}.DocumentClassifier")
+        # The embedding model loads while the document is being opened and read
+        get_embedding_manager().preload()
         self.logger.info("DocumentClassifier initialized")
     
     def classify_document(self, file_path: str) -> str:
@@ -257,6 +581,16 @@ class DocumentClassifier:
         except Exception as e:
             self.logger.error(f"Classification failed for {file_path}: {str(e)}")
             return "OTHERS"
+    
+    def classify_documents(self, file_paths: List[str]) -> List[str]:
+        """Classify several documents, batching the Gemini requests."""
+        try:
+            results = classify_documents(file_paths)
+            self.logger.info(f"Classification completed for {len(file_paths)} documents")
+            return results
+        except Exception as e:
+            self.logger.error(f"Batch classification failed: {str(e)}")
+            return ["OTHERS"] * len(file_paths)
 
 # --- Example --- #
 if __name__ == "__main__":    
@@ -11,24 +11,33 @@ from pathlib import Path
 
 # LangChain imports
 from langchain_core.documents import Document
+from langchain_community.docstore.in_memory import InMemoryDocstore
 from langchain_community.vectorstores import Pinecone, FAISS
-from langchain_community.document_loaders import PyMuPDFLoader, TextLoader, Docx2txtLoader
+from langchain_community.vectorstores.utils import DistanceStrategy
+from langchain_community.document_loaders import Docx2txtLoader
 from langchain_text_splitters import RecursiveCharacterTextSplitter
 
 # Local imports
-from utils import DocumentProcessor, EmbeddingManager, validate_file_type, create_metadata
+from utils import (
+    get_document_processor, get_embedding_manager, validate_file_type, create_metadata, create_faiss_index,
+    load_faiss_store, save_faiss_store
+)
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Vectors sent per Pinecone upsert request
+PINECONE_UPSERT_BATCH_SIZE = 100
+
 class DocumentIngester:
     """Handles document ingestion and storage"""
     
     def __init__(self, 
                  chunk_size: int = 2000, 
                  chunk_overlap: int = 400,
-                 embedding_model: str = "sentence-transformers/all-MiniLM-L6-v2"):
+                 embedding_model: str = "sentence-transformers/all-MiniLM-L6-v2",
+                 embedding_cache_dir: Optional[str] = "embedding_cache"):
         """
         Initialize document ingester
         
@@ -36,18 +45,21 @@ class DocumentIngester:
             chunk_size: Size of text chunks
             chunk_overlap: Overlap between chunks
             embedding_model: Name of embedding model to use
+            embedding_cache_dir: Directory caching chunk embeddings across runs (None disables it)
         """
         self.chunk_size = chunk_size
         self.chunk_overlap = chunk_overlap
         self.embedding_model = embedding_model
         
         # Initialize processors
-        self.doc_processor = DocumentProcessor()
+        self.doc_processor = get_document_processor()
         self.text_splitter = RecursiveCharacterTextSplitter(
             chunk_size=chunk_size,
             chunk_overlap=chunk_overlap
         )
-        self.embedding_manager = EmbeddingManager(embedding_model)
+        self.embedding_manager = get_embedding_manager(embedding_model, embedding_cache_dir)
+        # The model loads while the first document is read and split
+        self.embedding_manager.preload()
         
         # Storage options
         self.pinecone_index = None
@@ -59,9 +71,19 @@ class DocumentIngester:
         
         try:
             if file_extension == '.pdf':
-                loader = PyMuPDFLoader(file_path)
+                # Page texts come straight from PyMuPDF (cached on disk, extracted in
+                # worker processes for large files); pages are 0-indexed as PyMuPDFLoader did
+                page_texts = self.doc_processor.get_page_texts(file_path)
+                return [
+                    Document(
+                        page_content=text,
+                        metadata={'source': file_path, 'page': page_number, 'total_pages': len(page_texts)}
+                    )
+                    for page_number, text in enumerate(page_texts)
+                ]
             elif file_extension == '.txt':
-                loader = TextLoader(file_path, encoding='utf-8')
+                text = Path(file_path).read_text(encoding='utf-8', errors='replace')
+                return [Document(page_content=text, metadata={'source': file_path})]
             elif file_extension in ['.doc', '.docx']:
                 loader = Docx2txtLoader(file_path)
             else:
@@ -95,9 +117,10 @@ class DocumentIngester:
             logger.info(f"Splitting document into chunks")
             chunks = self.text_splitter.split_documents(documents)
             
-            # Add metadata
+            # Add metadata; the fields are per file (one timestamp per ingest), so they are built once
+            file_metadata = create_metadata(None, file_path)
             for chunk in chunks:
-                chunk.metadata.update(create_metadata(chunk, file_path))
+                chunk.metadata.update(file_metadata)
             
             logger.info(f"Processed {len(chunks)} chunks from {file_path}")
             return chunks
@@ -160,7 +183,9 @@ class DocumentIngester:
                 documents=documents,
                 embedding=self.embedding_manager.get_embeddings(),
                 index_name=self.pinecone_index.name,
-                namespace=namespace
+                namespace=namespace,
+                batch_size=PINECONE_UPSERT_BATCH_SIZE,  # Upserts are batched, not one request per chunk
+                embeddings_chunk_size=1000  # Texts embedded per embed_documents call
             )
             
             logger.info(f"Stored {len(documents)} documents in Pinecone namespace: {namespace}")
@@ -182,14 +207,23 @@ class DocumentIngester:
             FAISS vector store
         """
         try:
-            # Create FAISS vector store
-            vectorstore = FAISS.from_documents(
-                documents=documents,
-                embedding=self.embedding_manager.get_embeddings()
+            embeddings = self.embedding_manager.get_embeddings()
+            texts = [doc.page_content for doc in documents]
+            metadatas = [doc.metadata for doc in documents]
+            vectors = embeddings.embed_documents(texts)
+            
+            # Create FAISS vector store (quantized inner-product index over normalized embeddings)
+            vectorstore = FAISS(
+                embedding_function=embeddings,
+                index=create_faiss_index(len(vectors[0]), training_vectors=vectors),
+                docstore=InMemoryDocstore(),
+                index_to_docstore_id={},
+                distance_strategy=DistanceStrategy.MAX_INNER_PRODUCT
             )
+            vectorstore.add_embeddings(list(zip(texts, vectors)), metadatas=metadatas)
             
             # Save to disk
-            vectorstore.save_local(save_path)
+            save_faiss_store(vectorstore, save_path)
             self.faiss_index = vectorstore
             
             logger.info(f"Stored {len(documents)} documents in FAISS at: {save_path}")
@@ -211,7 +245,7 @@ class DocumentIngester:
         """
         try:
             if os.path.exists(load_path):
-                vectorstore = FAISS.load_local(load_path, self.embedding_manager.get_embeddings(), allow_dangerous_deserialization=True)
+                vectorstore = load_faiss_store(load_path, self.embedding_manager.get_embeddings())
                 self.faiss_index = vectorstore
                 logger.info(f"Loaded FAISS index from: {load_path}")
                 return vectorstore
@@ -1,12 +1,12 @@
 
 import sys
-import json
 import os
+from wrapper_utils import print_json
 from ingest import DocumentIngestor
 
 def main():
     if len(sys.argv) != 3:
-        print(json.dumps({"success": False, "error": "File path and document ID required"}))
+        print_json({"success": False, "error": "File path and document ID required"})
         sys.exit(1)
     
     file_path = sys.argv[1]
@@ -21,14 +21,14 @@ def main():
             "document_id": document_id,
             "chunks_created": result.get('chunks_created', 0)
         }
-        print(json.dumps(response))
+        print_json(response)
         
     except Exception as e:
         response = {
             "success": False,
             "error": str(e)
         }
-        print(json.dumps(response))
+        print_json(response)
         sys.exit(1)
 
 if __name__ == "__main__":
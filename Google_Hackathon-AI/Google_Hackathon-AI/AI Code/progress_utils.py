@@ -2,27 +2,59 @@ import json
 import time
 import os
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
 PROGRESS_FILE = "progress.json"
 
-def init_progress():
-    """Reset progress file to 0%."""
-    with open(PROGRESS_FILE, "w") as f:
-        json.dump({"progress": 0}, f)
+# Updates closer together than this (seconds) are coalesced; 0% and 100% are always written
+PROGRESS_WRITE_INTERVAL = 0.1
+
+_last_write = 0.0
+_last_progress = None
+_total_steps = None
+
+def _write_progress(progress):
+    """Atomically replace the progress file, so readers never see a half-written one."""
+    global _last_write, _last_progress
+    payload = {"progress": progress}
+    data = orjson.dumps(payload) if orjson is not None else json.dumps(payload).encode()
+    tmp_path = PROGRESS_FILE + ".tmp"
+    fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+    try:
+        os.write(fd, data)
+    finally:
+        os.close(fd)
+    os.replace(tmp_path, PROGRESS_FILE)
+    _last_write = time.monotonic()
+    _last_progress = progress
+
+def init_progress(total_steps=None):
+    """Reset progress file to 0%. When total_steps is given here, update_progress may omit it."""
+    global _total_steps
+    _total_steps = total_steps
+    _write_progress(0)
 
-def update_progress(step, total_steps):
+def update_progress(step, total_steps=None):
     """Update progress.json with current percentage."""
-    progress = int((step / total_steps) * 100)
-    with open(PROGRESS_FILE, "w") as f:
-        json.dump({"progress": progress}, f)
+    # Integer arithmetic: exact (the last step is always 100), and no float ops per call
+    progress = step * 100 // (total_steps or _total_steps)
+    if progress == _last_progress:
+        return
+    if progress < 100 and time.monotonic() - _last_write < PROGRESS_WRITE_INTERVAL:
+        return
+    _write_progress(progress)
 
 # Example usage inside ingestion
 def process_document(chunks):
-    init_progress()
     total = len(chunks)
+    init_progress(total)
 
     for i, chunk in enumerate(chunks, start=1):
         # ---- your processing logic here ----
         time.sleep(0.5)  # simulate work
 
         # update progress
-        update_progress(i, total)
+        update_progress(i)
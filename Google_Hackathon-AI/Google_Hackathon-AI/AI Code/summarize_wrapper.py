@@ -1,12 +1,12 @@
 
 import sys
-import json
 import os
+from wrapper_utils import print_json
 from summarize import DocumentSummarizer
 
 def main():
     if len(sys.argv) != 3:
-        print(json.dumps({"success": False, "error": "File path and classification required"}))
+        print_json({"success": False, "error": "File path and classification required"})
         sys.exit(1)
     
     file_path = sys.argv[1]
@@ -20,14 +20,14 @@ def main():
             "success": True,
             "summary": summary
         }
-        print(json.dumps(result))
+        print_json(result)
         
     except Exception as e:
         result = {
             "success": False,
             "error": str(e)
         }
-        print(json.dumps(result))
+        print_json(result)
         sys.exit(1)
 
 if __name__ == "__main__":
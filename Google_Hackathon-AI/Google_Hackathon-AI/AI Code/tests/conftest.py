@@ -0,0 +1,8 @@
+import os
+import sys
+
+# The modules import each other by name (from utils import ...), as the wrappers run them
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# ce2 refuses to import without a key; tests never reach the real API
+os.environ.setdefault("GEMINI_API_KEY", "test-key")
@@ -0,0 +1,87 @@
+import asyncio
+import json
+import threading
+
+import pytest
+
+ce2 = pytest.importorskip("ce2")
+
+CHUNK_TEXT = "Either party may terminate this agreement without notice."
+RESPONSE_TEXT = json.dumps({"results": [{"chunk_id": 1, "clauses": [{
+    "clause_title": "Termination",
+    "clause_summary": "Termination without notice.",
+    "risk_level": "HIGH",
+    "risk_explanation": "The contract can end at any time.",
+    "page_number": 1,
+}]}]})
+
+
+class FakeAsyncClient:
+    """Stands in for the gRPC client, which only works on the loop it was created on."""
+
+    def __init__(self, client_options=None):
+        self.loop = asyncio.get_running_loop()
+
+
+class FakeResponse:
+    text = RESPONSE_TEXT
+
+
+class FakeModel:
+    def __init__(self, model_name, system_instruction=None):
+        self._async_client = None
+
+    async def generate_content_async(self, prompt, generation_config=None):
+        if self._async_client.loop is not asyncio.get_running_loop():
+            raise RuntimeError("attached to a different loop")
+        return FakeResponse()
+
+
+@pytest.fixture
+def make_analyzer(monkeypatch, tmp_path):
+    monkeypatch.setattr(ce2.glm, "GenerativeServiceAsyncClient", FakeAsyncClient)
+    monkeypatch.setattr(ce2.genai, "GenerativeModel", FakeModel)
+
+    def make():
+        analyzer = ce2.OptimizedLegalAnalyzer()
+        analyzer.analysis_cache = ce2.ChunkAnalysisCache(analyzer.model_name, cache_dir=str(tmp_path / "cache"))
+        analyzer._prepare_chunks = lambda doc_path: ({1: 1}, [], [(1, CHUNK_TEXT)])
+        return analyzer
+
+    return make
+
+
+@pytest.fixture
+def doc_path(tmp_path):
+    path = tmp_path / "contract.txt"
+    path.write_text(CHUNK_TEXT)
+    return str(path)
+
+
+def test_two_analyzers_share_the_sync_loop(make_analyzer, doc_path):
+    for analyzer in (make_analyzer(), make_analyzer()):
+        report = analyzer.analyze_document(doc_path)
+        assert "error" not in report
+        assert len(report["clauses"]) == 1
+    assert not ce2._sync_loops.loop.is_closed()
+    assert len(ce2._async_clients) >= 1
+
+
+def test_sync_analyses_on_two_threads(make_analyzer, doc_path):
+    analyzer = make_analyzer()
+    reports = []
+    threads = [threading.Thread(target=lambda: reports.append(analyzer.analyze_document(doc_path))) for _ in range(2)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(reports) == 2
+    assert all("error" not in report for report in reports)
+
+
+def test_async_analysis_after_sync_call(make_analyzer, doc_path):
+    analyzer = make_analyzer()
+    assert "error" not in analyzer.analyze_document(doc_path)
+    report = asyncio.run(analyzer.aanalyze_document(doc_path))
+    assert "error" not in report
+    assert len(report["clauses"]) == 1
@@ -0,0 +1,46 @@
+import numpy as np
+import pytest
+
+pytest.importorskip("faiss")
+pytest.importorskip("langchain_community.vectorstores")
+utils = pytest.importorskip("utils")
+
+from langchain_core.embeddings import Embeddings
+
+
+class FixedEmbeddings(Embeddings):
+    """Maps each text to a precomputed normalized vector."""
+
+    def __init__(self, vectors):
+        self.vectors = vectors
+
+    def embed_documents(self, texts):
+        return [self.vectors[int(text)].tolist() for text in texts]
+
+    def embed_query(self, text):
+        return self.vectors[int(text)].tolist()
+
+
+def test_ivf_store_supports_mmr_after_reload(tmp_path):
+    rng = np.random.default_rng(0)
+    vectors = rng.standard_normal((utils.IVF_INDEX_MIN_VECTORS, 16)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    embeddings = FixedEmbeddings(vectors)
+    texts = [str(i) for i in range(len(vectors))]
+
+    index = utils.create_faiss_index(vectors.shape[1], training_vectors=vectors)
+    assert isinstance(index, utils.faiss.IndexIVFScalarQuantizer)
+    vectorstore = utils.FAISS(
+        embedding_function=embeddings,
+        index=index,
+        docstore=utils.InMemoryDocstore(),
+        index_to_docstore_id={},
+        distance_strategy=utils.DistanceStrategy.MAX_INNER_PRODUCT
+    )
+    vectorstore.add_embeddings(list(zip(texts, vectors.tolist())))
+    utils.save_faiss_store(vectorstore, str(tmp_path))
+
+    loaded = utils.load_faiss_store(str(tmp_path), embeddings)
+    results = loaded.max_marginal_relevance_search("0", k=4, fetch_k=20)
+    assert len(results) == 4
+    assert results[0].page_content == "0"
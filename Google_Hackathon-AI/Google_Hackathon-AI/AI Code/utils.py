@@ -1,7 +1,23 @@
+import asyncio
+import hashlib
+import io
+import json
 import logging
+import mmap
+import pickle
+import re
+import sqlite3
+import threading
+import time
+import zipfile
+import zlib
+from xml.etree import ElementTree
 import fitz  # PyMuPDF
+from concurrent.futures import ProcessPoolExecutor
+from collections import OrderedDict
+from functools import lru_cache
 from pathlib import Path
-from typing import Dict, Any, List
+from typing import Callable, Dict, Any, Iterator, List, Optional, Tuple
 from datetime import datetime
 import os
 
@@ -12,6 +28,56 @@ except ImportError:
     HuggingFaceEmbeddings = None
     logging.warning("HuggingFace embeddings not available")
 
+try:
+    from charset_normalizer import from_bytes as detect_encoding
+except ImportError:
+    detect_encoding = None
+
+try:
+    import torch
+except ImportError:
+    torch = None
+
+try:
+    import onnxruntime
+except ImportError:
+    onnxruntime = None
+
+try:
+    import faiss
+    import numpy as np
+except ImportError:
+    faiss = None
+    np = None
+    logging.warning("FAISS not available")
+
+try:
+    from langchain.embeddings import CacheBackedEmbeddings
+    from langchain.storage import LocalFileStore
+except ImportError:
+    CacheBackedEmbeddings = None
+    LocalFileStore = None
+    logging.warning("LangChain embedding cache not available")
+
+try:
+    from langchain_community.docstore.in_memory import InMemoryDocstore
+    from langchain_community.vectorstores import FAISS
+    from langchain_community.vectorstores.utils import DistanceStrategy
+except ImportError:
+    FAISS = None
+    logging.warning("LangChain FAISS vector store not available")
+
+try:
+    from langchain_community.cache import SQLiteCache
+except ImportError:
+    SQLiteCache = None
+    logging.warning("LangChain SQLite LLM cache not available")
+
+try:
+    from langchain_core.embeddings import Embeddings
+except ImportError:
+    Embeddings = object
+
 try:
     from langchain_core.documents import Document
 except ImportError:
@@ -23,6 +89,91 @@ except ImportError:
 
 logger = logging.getLogger(__name__)
 
+# MuPDF's resource store (fonts, glyphs) is process-wide and persists across documents, so
+# batch loads reuse it as long as nothing shrinks it. Parser warnings on damaged PDFs are
+# kept in fitz.TOOLS.mupdf_warnings() instead of being written to stderr page by page.
+fitz.TOOLS.mupdf_display_errors(False)
+
+# On-disk cache of LLM responses, shared by every Gemini client in the process. Prompts hold
+# document text, so it is only used when LLM_CACHE_PATH is set; only the most recently
+# written LLM_CACHE_MAX_ENTRIES responses are kept, older ones are purged when it is opened.
+LLM_CACHE_PATH = os.getenv("LLM_CACHE_PATH", "")
+LLM_CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "10000"))
+
+# Embedding models loaded in this process, shared by every EmbeddingManager
+_EMBEDDINGS_CACHE: Dict[str, Any] = {}
+# Backend and precision each of those models was loaded with, e.g. "cpu-fp32"
+_EMBEDDINGS_BACKENDS: Dict[str, str] = {}
+_EMBEDDINGS_LOCK = threading.Lock()
+
+# int8 quantization learns each dimension's range from the indexed vectors, which
+# needs enough of them to be representative; smaller stores use fp16 instead
+INT8_INDEX_MIN_VECTORS = 256
+
+# Past this many vectors a flat scan per query dominates search time; the index is
+# partitioned into ~sqrt(N) inverted lists and each query only scans IVF_NPROBE of them
+IVF_INDEX_MIN_VECTORS = 10_000
+IVF_NPROBE = 16
+
+# From this size an HNSW graph (logarithmic search, slightly lower recall) replaces IVF
+HNSW_INDEX_MIN_VECTORS = 50_000
+HNSW_M = 32
+HNSW_EF_CONSTRUCTION = 200
+HNSW_EF_SEARCH = 64
+
+# Saved vector store layout: the raw FAISS index plus one JSON line per document,
+# in index order. Replaces the pickled docstore written by FAISS.save_local
+FAISS_INDEX_FILE = "index.faiss"
+FAISS_DOCSTORE_FILE = "docstore.jsonl"
+
+# Texts per sentence-transformers forward pass when embedding documents
+EMBEDDING_BATCH_SIZE = 64
+
+# On CPU, embeddings run through this int8-quantized ONNX export of the model when
+# onnxruntime is installed (sentence-transformers >= 3.2). sentence-transformers/all-MiniLM-L6-v2
+# ships it; for models without it the PyTorch weights are used. Set to "" to disable.
+EMBEDDING_ONNX_FILE = os.getenv("EMBEDDING_ONNX_FILE", "onnx/model_qint8_avx512_vnni.onnx")
+
+# Recent query vectors kept in memory, so repeated questions skip the model forward pass
+QUERY_EMBEDDING_CACHE_SIZE = 1024
+
+# Extraction strategy is chosen by page count. Text extraction costs a few ms per page,
+# so smaller PDFs are read in a single in-process pass; only PDFs with at least this
+# many pages are worth spawning worker processes for (PyMuPDF is not thread-safe,
+# so threads cannot be used for this)
+PARALLEL_EXTRACTION_MIN_PAGES = 200
+
+# PDFs kept open between page queries (each holds a file handle, which on Windows
+# also keeps the file from being replaced or deleted until close_open_pdfs)
+OPEN_PDF_CACHE_SIZE = 4
+
+# The page texts of the most recently read PDFs are kept in memory, so summarizing
+# or re-indexing the same file again in this process skips even the disk cache
+PAGE_TEXT_MEMORY_CACHE_SIZE = 8
+
+# Plain-text extraction flags: PyMuPDF's "text" defaults, with image blocks explicitly
+# excluded. Vector graphics are never collected for text output, so drawing-heavy pages
+# only pay for parsing their content stream, not for building images or paths
+TEXT_EXTRACTION_FLAGS = fitz.TEXTFLAGS_TEXT & ~fitz.TEXT_PRESERVE_IMAGES
+
+# Extracted text is only cached on disk when DOCUMENT_CACHE_DIR is set, since it is the full
+# plaintext of (confidential) documents. The cache is one SQLite file in that directory:
+# PDF page texts keyed by file path, mtime, size and parser version, other load_document
+# results keyed by a hash of the file contents (so an unchanged or copied file skips parsing).
+# Entries older than DOCUMENT_CACHE_MAX_AGE_DAYS are purged whenever the cache is opened.
+# Bump PAGE_TEXT_CACHE_VERSION / DOCUMENT_CACHE_VERSION whenever extraction or loader output changes.
+DOCUMENT_CACHE_DIR = os.getenv("DOCUMENT_CACHE_DIR", "")
+DOCUMENT_CACHE_FILE = "documents.db"
+DOCUMENT_CACHE_MAX_AGE_DAYS = float(os.getenv("DOCUMENT_CACHE_MAX_AGE_DAYS", "7"))
+DOCUMENT_CACHE_VERSION = "1"
+PAGE_TEXT_CACHE_VERSION = "1"
+
+# Bytes of a text file sampled to detect its encoding when it is not UTF-8
+TEXT_ENCODING_SAMPLE_BYTES = 64 * 1024
+
+# Worker processes used by DocumentProcessor.load_documents (default: all cores but one)
+LOAD_DOCUMENTS_NUMBER_OF_THREADS = int(os.getenv("LOAD_DOCUMENTS_NUMBER_OF_THREADS", "0")) or None
+
 
 def validate_file_type(file_path: str) -> bool:
     """Validate if the file type is supported."""
@@ -31,6 +182,251 @@ def validate_file_type(file_path: str) -> bool:
     return file_extension in supported_extensions
 
 
+def estimate_tokens(text: str) -> int:
+    """Cheap token estimate (~4 characters per token) for budgeting LLM inputs."""
+    return len(text) // 4
+
+
+# Soft hyphens (with the line break that follows one at a line end), zero-width characters
+# and BOMs: invisible in the rendered PDF but still sent, and paid for, as prompt tokens
+_INVISIBLE_CHARS_RE = re.compile(r"\u00ad\n?|[\u200b\u200c\u200d\u2060\ufeff]")
+_HORIZONTAL_WS_RE = re.compile(r"[ \t\r\f\v\u00a0]+")
+_NEWLINE_WS_RE = re.compile(r" ?\n ?")
+_BLANK_LINES_RE = re.compile(r"\n{3,}")
+
+
+def normalize_whitespace(text: str) -> str:
+    """Collapse runs of spaces and blank lines (common in PDF tables) while keeping paragraph breaks."""
+    text = _INVISIBLE_CHARS_RE.sub("", text)
+    text = _HORIZONTAL_WS_RE.sub(" ", text)
+    text = _NEWLINE_WS_RE.sub("\n", text)
+    return _BLANK_LINES_RE.sub("\n\n", text).strip()
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """Truncate text to roughly max_tokens tokens, cutting at a word boundary."""
+    max_chars = max_tokens * 4
+    if len(text) <= max_chars:
+        return text
+    cut = text.rfind(" ", 0, max_chars)
+    return text[:cut if cut > 0 else max_chars]
+
+
+def split_to_tokens(text: str, max_tokens: int, overlap_tokens: int = 0) -> List[str]:
+    """
+    Split text into pieces of roughly max_tokens tokens, cut at word boundaries, where each
+    piece repeats about the last overlap_tokens tokens of the previous one.
+    """
+    max_chars = max_tokens * 4
+    overlap_chars = overlap_tokens * 4
+    pieces = []
+    start = 0
+    while len(text) - start > max_chars:
+        cut = text.rfind(" ", start + 1, start + max_chars)
+        if cut <= start:
+            cut = start + max_chars
+        pieces.append(text[start:cut].strip())
+        # The next piece starts at the first word boundary inside the overlap (if there is one)
+        next_start = cut - overlap_chars
+        space = text.find(" ", next_start, cut) if overlap_chars else -1
+        start = max(space + 1 if space != -1 else next_start, start + 1)
+    pieces.append(text[start:].strip())
+    return pieces
+
+
+@lru_cache(maxsize=1)
+def get_llm_cache():
+    """Returns the shared SQLite LLM response cache, or None if it is disabled or unavailable."""
+    if not LLM_CACHE_PATH or SQLiteCache is None:
+        return None
+    try:
+        llm_cache = SQLiteCache(database_path=LLM_CACHE_PATH)
+    except Exception as e:
+        logger.warning(f"Could not open LLM cache at {LLM_CACHE_PATH}: {e}")
+        return None
+
+    # Rows are appended in write order, so the newest entries have the highest rowids
+    try:
+        with sqlite3.connect(LLM_CACHE_PATH, timeout=30) as conn:
+            conn.execute(
+                "DELETE FROM full_llm_cache WHERE rowid NOT IN "
+                "(SELECT rowid FROM full_llm_cache ORDER BY rowid DESC LIMIT ?)",
+                (LLM_CACHE_MAX_ENTRIES,)
+            )
+    except sqlite3.Error as e:
+        logger.warning(f"Could not trim LLM cache at {LLM_CACHE_PATH}: {e}")
+    return llm_cache
+
+
+def create_faiss_index(dimension: int, training_vectors: Optional[List[List[float]]] = None):
+    """
+    Create a FAISS index for normalized embeddings.
+    Inner product on L2-normalized vectors equals cosine similarity. Given at least
+    INT8_INDEX_MIN_VECTORS training vectors, the index is int8 scalar-quantized (a quarter
+    of the memory of float32) and trained on them, so it is ready to add those vectors;
+    from IVF_INDEX_MIN_VECTORS on it is also IVF-partitioned, and from HNSW_INDEX_MIN_VECTORS
+    on it is searched through an HNSW graph instead. Otherwise it is an fp16 index, which
+    needs no training.
+    """
+    if faiss is None:
+        raise ImportError("FAISS not available. Install with: pip install faiss-cpu")
+    if training_vectors is None or len(training_vectors) < INT8_INDEX_MIN_VECTORS:
+        return faiss.IndexScalarQuantizer(dimension, faiss.ScalarQuantizer.QT_fp16, faiss.METRIC_INNER_PRODUCT)
+
+    # Per-dimension int8 ranges (and IVF centroids) are learned from the vectors themselves
+    training_vectors = np.asarray(training_vectors, dtype=np.float32)
+    if len(training_vectors) >= HNSW_INDEX_MIN_VECTORS:
+        index = faiss.IndexHNSWSQ(dimension, faiss.ScalarQuantizer.QT_8bit, HNSW_M, faiss.METRIC_INNER_PRODUCT)
+        index.hnsw.efConstruction = HNSW_EF_CONSTRUCTION
+        index.hnsw.efSearch = HNSW_EF_SEARCH  # Saved with the index, like nprobe below
+        index.train(training_vectors)
+        return index
+
+    if len(training_vectors) >= IVF_INDEX_MIN_VECTORS:
+        nlist = int(np.sqrt(len(training_vectors)))
+        quantizer = faiss.IndexFlatIP(dimension)
+        index = faiss.IndexIVFScalarQuantizer(
+            quantizer, dimension, nlist, faiss.ScalarQuantizer.QT_8bit, faiss.METRIC_INNER_PRODUCT
+        )
+        index.train(training_vectors)
+        index.nprobe = IVF_NPROBE  # Saved with the index, so loaded stores search the same way
+        return index
+
+    index = faiss.IndexScalarQuantizer(dimension, faiss.ScalarQuantizer.QT_8bit, faiss.METRIC_INNER_PRODUCT)
+    index.train(training_vectors)
+    return index
+
+
+def _enable_reconstruct(index):
+    """MMR retrieval reconstructs stored vectors, which IVF indexes only support with a direct map."""
+    ivf_index = faiss.try_extract_index_ivf(index)
+    if ivf_index is not None and ivf_index.direct_map.type == faiss.DirectMap.NoMap:
+        ivf_index.make_direct_map()
+
+
+def save_faiss_store(vectorstore, folder_path: str):
+    """Save a FAISS vector store as its raw index plus a JSON-lines docstore (no pickle)."""
+    os.makedirs(folder_path, exist_ok=True)
+    # Built now, the direct map is saved with the index
+    _enable_reconstruct(vectorstore.index)
+    # Readers memory-map the index, so both files are written aside and then swapped in
+    # with os.replace, back to back, instead of being overwritten in place
+    index_path = os.path.join(folder_path, FAISS_INDEX_FILE)
+    faiss.write_index(vectorstore.index, index_path + ".tmp")
+
+    docstore_path = os.path.join(folder_path, FAISS_DOCSTORE_FILE)
+    with open(docstore_path + ".tmp", 'w', encoding='utf-8') as f:
+        for position in range(len(vectorstore.index_to_docstore_id)):
+            doc_id = vectorstore.index_to_docstore_id[position]
+            doc = vectorstore.docstore.search(doc_id)
+            record = {"id": doc_id, "page_content": doc.page_content, "metadata": doc.metadata}
+            f.write(json.dumps(record, ensure_ascii=False, default=str) + "\n")
+
+    os.replace(index_path + ".tmp", index_path)
+    os.replace(docstore_path + ".tmp", docstore_path)
+
+
+def load_faiss_store(folder_path: str, embeddings):
+    """
+    Load a vector store saved by save_faiss_store. The index is memory-mapped where
+    FAISS supports it for the index type, so vectors are paged in as they are searched.
+    Stores saved with FAISS.save_local (pickled docstore) are still loaded as before.
+    """
+    if FAISS is None or faiss is None:
+        raise ImportError("FAISS not available. Install with: pip install faiss-cpu langchain-community")
+
+    docstore_path = os.path.join(folder_path, FAISS_DOCSTORE_FILE)
+    if not os.path.exists(docstore_path):
+        # Pickled stores were mostly built with the default L2 index, whose distances must keep
+        # the default (Euclidean) strategy; only an inner-product index is scored as one
+        vectorstore = FAISS.load_local(folder_path, embeddings, allow_dangerous_deserialization=True)
+        if vectorstore.index.metric_type == faiss.METRIC_INNER_PRODUCT:
+            vectorstore.distance_strategy = DistanceStrategy.MAX_INNER_PRODUCT
+        return vectorstore
+
+    index = faiss.read_index(os.path.join(folder_path, FAISS_INDEX_FILE), faiss.IO_FLAG_MMAP)
+    _enable_reconstruct(index)  # IVF stores saved before the direct map was added
+    documents = {}
+    index_to_docstore_id = {}
+    with open(docstore_path, 'r', encoding='utf-8') as f:
+        for position, line in enumerate(f):
+            record = json.loads(line)
+            documents[record["id"]] = Document(page_content=record["page_content"], metadata=record["metadata"])
+            index_to_docstore_id[position] = record["id"]
+    if index.ntotal != len(index_to_docstore_id):
+        # Read between the two replaces of a concurrent save_faiss_store
+        raise ValueError(f"FAISS store at {folder_path} is being rewritten (index and docstore sizes differ), retry")
+
+    return FAISS(
+        embedding_function=embeddings,
+        index=index,
+        docstore=InMemoryDocstore(documents),
+        index_to_docstore_id=index_to_docstore_id,
+        distance_strategy=DistanceStrategy.MAX_INNER_PRODUCT
+    )
+
+
+def batch_similarity_search(vectorstore, embeddings, queries: List[str], k: int = 4) -> List[List[Document]]:
+    """
+    Top-k documents for several queries with one embedding call and one FAISS search,
+    instead of a similarity_search (embed + search) round per query.
+    """
+    if not queries:
+        return []
+    if faiss is None:
+        raise ImportError("FAISS not available. Install with: pip install faiss-cpu")
+
+    # Query vectors are not worth caching on disk, so bypass any caching wrappers
+    while hasattr(embeddings, 'underlying_embeddings'):
+        embeddings = embeddings.underlying_embeddings
+    vectors = np.asarray(embeddings.embed_documents(queries), dtype=np.float32)
+    _, positions = vectorstore.index.search(vectors, k)
+
+    docstore = vectorstore.docstore
+    index_to_docstore_id = vectorstore.index_to_docstore_id
+    return [
+        # FAISS pads missing results with -1 when the index holds fewer than k vectors
+        [docstore.search(index_to_docstore_id[position]) for position in row if position != -1]
+        for row in positions.tolist()
+    ]
+
+
+def _word_shingles(text: str, size: int) -> set:
+    """Set of lowercase word n-grams used for near-duplicate detection."""
+    words = text.lower().split()
+    if len(words) < size:
+        return {tuple(words)} if words else set()
+    return {tuple(words[i:i + size]) for i in range(len(words) - size + 1)}
+
+
+def find_near_duplicates(texts: List[str], threshold: float = 0.6, shingle_size: int = 5) -> List[Optional[int]]:
+    """
+    For each text, the index of an earlier non-duplicate text whose word 5-gram Jaccard
+    similarity exceeds threshold, or None if the text is not a near-duplicate.
+    """
+    duplicate_of: List[Optional[int]] = []
+    kept: List[tuple] = []
+    for index, text in enumerate(texts):
+        shingles = _word_shingles(text, shingle_size)
+        duplicate_of.append(next(
+            (kept_index for kept_index, other in kept
+             if shingles and len(shingles & other) / len(shingles | other) > threshold),
+            None
+        ))
+        if duplicate_of[-1] is None:
+            kept.append((index, shingles))
+    return duplicate_of
+
+
+def deduplicate_documents(documents: List[Document], threshold: float = 0.6, shingle_size: int = 5) -> List[Document]:
+    """
+    Drop documents whose word 5-gram Jaccard similarity to an earlier kept document exceeds threshold.
+    Used after retrieval so overlapping chunks are not stuffed into the prompt twice.
+    """
+    duplicate_of = find_near_duplicates([doc.page_content for doc in documents], threshold, shingle_size)
+    return [doc for doc, duplicate in zip(documents, duplicate_of) if duplicate is None]
+
+
 def create_metadata(chunk, file_path: str) -> Dict[str, Any]:
     """Create metadata for document chunks."""
     return {
@@ -42,11 +438,157 @@ def create_metadata(chunk, file_path: str) -> Dict[str, Any]:
     }
 
 
+def _page_text(doc, page_num: int) -> str:
+    """Text of one page of an open PDF; a page that fails to parse is logged and left empty."""
+    try:
+        return doc.load_page(page_num).get_text("text", flags=TEXT_EXTRACTION_FLAGS)
+    except Exception as e:
+        logger.warning(f"Error processing page {page_num + 1} of {doc.name}: {e}")
+        return ""
+
+
+def _page_texts_in_range(doc, start: int, stop: int) -> List[str]:
+    """Text of pages [start, stop) of an open PDF, with failed pages left empty."""
+    return [_page_text(doc, page_num) for page_num in range(start, stop)]
+
+
+def _extract_page_range(pdf_path: str, start: int, stop: int) -> List[str]:
+    """Extract the text of pages [start, stop) with a single open (top-level so worker processes can pickle it)."""
+    with fitz.open(pdf_path) as doc:
+        return _page_texts_in_range(doc, start, stop)
+
+
+# The processor load_documents was called on, as unpickled once in each worker process
+_worker_processor: Optional["DocumentProcessor"] = None
+
+
+def _init_document_worker(processor: "DocumentProcessor"):
+    global _worker_processor
+    _worker_processor = processor
+
+
+def _load_document_in_worker(file_path: str) -> Dict[str, Any]:
+    """Load one file for load_documents (top-level so worker processes can pickle it)."""
+    return _worker_processor._load_document_result(file_path)
+
+
+_W_NS = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+_W_BODY, _W_P, _W_T, _W_TAB = _W_NS + "body", _W_NS + "p", _W_NS + "t", _W_NS + "tab"
+_W_BREAKS = {_W_NS + "br", _W_NS + "cr"}
+
+
+def _docx_paragraph_text(file_path: str) -> str:
+    """
+    Text of a .docx file's body paragraphs, one per line, as python-docx's doc.paragraphs
+    gives it. word/document.xml is parsed as a stream into a single buffer, and each
+    paragraph's elements are freed once it is read, instead of building the object model.
+    """
+    buffer = io.StringIO()
+    parents: List[str] = []
+    paragraph_parts: List[List[str]] = []
+    first_paragraph = True
+    with zipfile.ZipFile(file_path) as archive, archive.open('word/document.xml') as xml_file:
+        for event, elem in ElementTree.iterparse(xml_file, events=('start', 'end')):
+            if event == 'start':
+                parents.append(elem.tag)
+                if elem.tag == _W_P:
+                    paragraph_parts.append([])
+                continue
+
+            parents.pop()
+            if elem.tag == _W_P:
+                parts = paragraph_parts.pop()
+                # Only paragraphs directly in the body count (not tables or text boxes)
+                if parents and parents[-1] == _W_BODY:
+                    if not first_paragraph:
+                        buffer.write('\n')
+                    buffer.write(''.join(parts))
+                    first_paragraph = False
+            elif paragraph_parts:
+                if elem.tag == _W_T:
+                    paragraph_parts[-1].append(elem.text or '')
+                elif elem.tag == _W_TAB:
+                    paragraph_parts[-1].append('\t')
+                elif elem.tag in _W_BREAKS:
+                    paragraph_parts[-1].append('\n')
+
+            if parents and parents[-1] == _W_BODY:
+                elem.clear()
+    return buffer.getvalue()
+
+
+# Open fitz documents by absolute path, as (mtime_ns, size, document), least recently used first.
+# fitz documents are not thread-safe, so they are only used, opened and closed under the lock
+_OPEN_PDFS: "OrderedDict[str, Tuple[int, int, Any]]" = OrderedDict()
+_OPEN_PDF_LOCK = threading.Lock()
+
+
+def _open_pdf(pdf_path: str):
+    """
+    Returns an open fitz document, shared by repeated page queries on the same PDF so its
+    xref table is parsed once. Call with _OPEN_PDF_LOCK held. A changed file (new mtime or
+    size) is reopened, and documents are closed as soon as they are replaced or evicted.
+    """
+    stat = os.stat(pdf_path)
+    path = os.path.abspath(pdf_path)
+    entry = _OPEN_PDFS.pop(path, None)
+    if entry is not None and entry[:2] == (stat.st_mtime_ns, stat.st_size):
+        doc = entry[2]
+    else:
+        if entry is not None:
+            entry[2].close()
+        doc = fitz.open(pdf_path)
+    _OPEN_PDFS[path] = (stat.st_mtime_ns, stat.st_size, doc)
+    while len(_OPEN_PDFS) > OPEN_PDF_CACHE_SIZE:
+        _, (_, _, evicted) = _OPEN_PDFS.popitem(last=False)
+        evicted.close()
+    return doc
+
+
+def close_open_pdfs():
+    """Closes the PDFs kept open between page queries, releasing their file handles."""
+    with _OPEN_PDF_LOCK:
+        while _OPEN_PDFS:
+            _, (_, _, doc) = _OPEN_PDFS.popitem()
+            doc.close()
+
+
 class DocumentProcessor:
     """Handles document processing for multiple file types with improved error handling."""
 
     def __init__(self):
         self.logger = logging.getLogger(f"{__name__}.DocumentProcessor")
+        # Loader per file extension; register_loader adds formats without touching load_document
+        self._loaders: Dict[str, Callable[[str], List[Document]]] = {
+            '.pdf': self._load_pdf,
+            '.txt': self._load_text,
+            '.doc': self._load_word,
+            '.docx': self._load_word,
+        }
+        self._page_texts_memory: "OrderedDict[str, List[str]]" = OrderedDict()
+        self._page_texts_lock = threading.Lock()
+
+    def __getstate__(self):
+        # Sent to load_documents' workers with its loaders and settings, but not its in-memory caches
+        state = self.__dict__.copy()
+        del state['_page_texts_memory'], state['_page_texts_lock']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._page_texts_memory = OrderedDict()
+        self._page_texts_lock = threading.Lock()
+
+    def register_loader(self, file_extension: str, loader: Callable[[str], List[Document]]):
+        """Registers (or replaces) the loader used for files with the given extension, e.g. '.md'."""
+        self._loaders[file_extension.lower()] = loader
+
+    def get_file_metadata(self, file_path: str, name: str) -> Optional[str]:
+        """A value previously stored for this version of the file, if the processor persists them."""
+        return None
+
+    def set_file_metadata(self, file_path: str, name: str, value: str):
+        """Stores a value derived from this version of the file (a no-op unless the processor persists them)."""
 
     def load_document(self, file_path: str) -> List[Document]:
         """Load document and return as LangChain Document objects."""
@@ -57,67 +599,128 @@ class DocumentProcessor:
             file_extension = Path(file_path).suffix.lower()
             self.logger.info(f"Loading {file_extension} file: {file_path}")
             
-            if file_extension == '.pdf':
-                return self._load_pdf(file_path)
-            elif file_extension == '.txt':
-                return self._load_text(file_path)
-            elif file_extension in ['.doc', '.docx']:
-                return self._load_word(file_path)
-            else:
+            loader = self._loaders.get(file_extension)
+            if loader is None:
                 raise ValueError(f"Unsupported file type: {file_extension}")
+            return loader(file_path)
                 
         except Exception as e:
             self.logger.error(f"Error loading document {file_path}: {e}")
             raise
     
-    def _load_pdf(self, file_path: str) -> List[Document]:
-        """Load PDF document with improved text extraction."""
+    def load_documents(self, file_paths: List[str], workers: Optional[int] = None) -> List[Dict[str, Any]]:
+        """
+        Load several files in parallel worker processes, so PDF and DOCX parsing uses every core.
+        Returns one {"path", "documents", "error"} result per file, in order; a file that fails
+        to load has an error message and no documents instead of aborting the batch.
+        """
+        workers = workers or LOAD_DOCUMENTS_NUMBER_OF_THREADS or max(1, (os.cpu_count() or 1) - 1)
+        workers = min(workers, len(file_paths))
+        if workers > 1:
+            # Workers load with a copy of this processor, so registered loaders apply there too
+            try:
+                pickle.dumps(self)
+            except Exception as e:
+                self.logger.warning(f"Loading documents in this process, the processor cannot be sent to workers: {e}")
+                workers = 1
+        if workers <= 1:
+            results = [self._load_document_result(file_path) for file_path in file_paths]
+        else:
+            with ProcessPoolExecutor(max_workers=workers, initializer=_init_document_worker, initargs=(self,)) as executor:
+                results = list(executor.map(_load_document_in_worker, file_paths))
+
+        failed = [result for result in results if result["error"]]
+        if failed:
+            self.logger.warning(f"{len(failed)} of {len(file_paths)} documents failed to load")
+        return results
+
+    def _load_document_result(self, file_path: str) -> Dict[str, Any]:
+        """load_document as a load_documents result, with any error caught."""
+        try:
+            return {"path": file_path, "documents": self.load_document(file_path), "error": None}
+        except Exception as e:
+            return {"path": file_path, "documents": [], "error": str(e)}
+
+    async def aload_document(self, file_path: str) -> List[Document]:
+        """Async version of load_document; parsing runs in an executor thread, off the event loop."""
+        return await asyncio.get_running_loop().run_in_executor(None, self.load_document, file_path)
+
+    async def aload_documents(self, file_paths: List[str], workers: Optional[int] = None) -> List[Dict[str, Any]]:
+        """
+        Async version of load_documents. The files are parsed in worker processes (PyMuPDF
+        cannot parse concurrently in threads), whose count also bounds concurrent disk reads.
+        """
+        return await asyncio.get_running_loop().run_in_executor(None, self.load_documents, file_paths, workers)
+
+    def stream_document(self, file_path: str) -> Iterator[Document]:
+        """
+        Yields the document's pages as Documents one at a time. PDF pages are extracted as they
+        are consumed, so only one page's text is held at once and consumers can stop early;
+        other file types are loaded whole by load_document. Pages without text (or that fail
+        to parse) are skipped.
+        """
+        if Path(file_path).suffix.lower() != '.pdf':
+            yield from self.load_document(file_path)
+            return
+
+        if not os.path.exists(file_path):
+            raise FileNotFoundError(f"File not found: {file_path}")
+        with fitz.open(file_path) as doc:
+            total_pages = doc.page_count
+            for page_num in range(total_pages):
+                text = _page_text(doc, page_num)
+                if text.strip():
+                    yield Document(
+                        page_content=text,
+                        metadata={
+                            'source': file_path,
+                            'page': page_num + 1,  # 1-indexed page numbers
+                            'total_pages': total_pages,
+                            'file_type': 'pdf',
+                        }
+                    )
+
+    def _load_pdf(self, file_path: str, max_pages: Optional[int] = None) -> List[Document]:
+        """Load PDF document with improved text extraction, optionally only its first max_pages pages."""
         documents = []
         try:
-            with fitz.open(file_path) as doc:
-                total_pages = doc.page_count
-                self.logger.info(f"Processing PDF with {total_pages} pages")
-                
-                for page_num in range(total_pages):
-                    try:
-                        page = doc.load_page(page_num)
-                        text = page.get_text()
-                        
-                        # If no text extracted, try alternative methods
-                        if not text.strip():
-                            # Try to extract from images or other elements
-                            text = page.get_text("text")  # alternative extraction
-                        
-                        if text.strip():  # Only add non-empty pages
-                            documents.append(Document(
-                                page_content=text,
-                                metadata={
-                                    'source': file_path,
-                                    'page': page_num + 1,  # 1-indexed page numbers
-                                    'total_pages': total_pages,
-                                    'file_type': 'pdf',
-                                }
-                            ))
-                        else:
-                            self.logger.debug(f"Page {page_num + 1} contains no extractable text")
-                            
-                    except Exception as e:
-                        self.logger.warning(f"Error processing page {page_num + 1}: {e}")
-                        continue
-                        
-                if not documents:
-                    self.logger.warning(f"No text content extracted from PDF: {file_path}")
-                    # Return a document indicating the PDF was processed but contained no text
+            if max_pages is None:
+                # Cached on disk, and extracted in parallel worker processes for large PDFs
+                page_texts = self.get_page_texts(file_path)
+                total_pages = len(page_texts)
+            else:
+                with fitz.open(file_path) as doc:
+                    total_pages = doc.page_count
+                    page_texts = _page_texts_in_range(doc, 0, min(max_pages, total_pages))
+            self.logger.info(f"Processing PDF with {total_pages} pages")
+            
+            for page_num, text in enumerate(page_texts):
+                if text.strip():  # Only add non-empty pages
                     documents.append(Document(
-                        page_content="No extractable text found in this PDF document.",
+                        page_content=text,
                         metadata={
                             'source': file_path,
-                            'file_type': 'pdf',
+                            'page': page_num + 1,  # 1-indexed page numbers
                             'total_pages': total_pages,
-                            'error': 'No extractable text'
+                            'file_type': 'pdf',
                         }
                     ))
+                else:
+                    self.logger.debug(f"Page {page_num + 1} contains no extractable text")
                     
+            if not documents:
+                self.logger.warning(f"No text content extracted from PDF: {file_path}")
+                # Return a document indicating the PDF was processed but contained no text
+                documents.append(Document(
+                    page_content="No extractable text found in this PDF document.",
+                    metadata={
+                        'source': file_path,
+                        'file_type': 'pdf',
+                        'total_pages': total_pages,
+                        'error': 'No extractable text'
+                    }
+                ))
+                
         except Exception as e:
             self.logger.error(f"Error loading PDF {file_path}: {e}")
             raise
@@ -126,18 +729,23 @@ class DocumentProcessor:
     def _load_text(self, file_path: str) -> List[Document]:
         """Load text document with improved encoding handling."""
         try:
-            # Try different encodings
-            encodings = ['utf-8', 'utf-8-sig', 'latin-1', 'cp1252']
+            # The file is memory-mapped and decoded straight from the mapping, so its bytes are
+            # never copied into a Python bytes object; each encoding is tried on the same mapping
             content = None
-            
-            for encoding in encodings:
-                try:
-                    with open(file_path, 'r', encoding=encoding) as file:
-                        content = file.read()
-                        self.logger.info(f"Successfully read text file with {encoding} encoding")
-                        break
-                except UnicodeDecodeError:
-                    continue
+            with open(file_path, 'rb') as file:
+                # One fstat on the open file serves both the empty check and the metadata
+                file_size = os.fstat(file.fileno()).st_size
+                if file_size == 0:
+                    content = ''
+                else:
+                    with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as raw:
+                        for encoding in self._candidate_encodings(raw):
+                            try:
+                                content = str(raw, encoding)
+                                self.logger.info(f"Successfully read text file with {encoding} encoding")
+                                break
+                            except (UnicodeDecodeError, LookupError):
+                                continue
             
             if content is None:
                 raise ValueError("Could not decode text file with any supported encoding")
@@ -147,13 +755,26 @@ class DocumentProcessor:
                 metadata={
                     'source': file_path,
                     'file_type': 'txt',
-                    'file_size': os.path.getsize(file_path)
+                    'file_size': file_size
                 }
             )]
         except Exception as e:
             self.logger.error(f"Error loading text file {file_path}: {e}")
             raise
     
+    @staticmethod
+    def _candidate_encodings(raw) -> Iterator[str]:
+        """Encodings to try for a text file, most likely first. Detection only runs for non-UTF-8 files."""
+        yield 'utf-8'
+        yield 'utf-8-sig'
+        # latin-1 decodes any bytes, so a detected encoding has to be tried before it
+        if detect_encoding is not None:
+            best = detect_encoding(raw[:TEXT_ENCODING_SAMPLE_BYTES]).best()
+            if best is not None:
+                yield best.encoding
+        yield 'latin-1'
+        yield 'cp1252'
+
     def _load_word(self, file_path: str) -> List[Document]:
         """Load Word document with improved error handling."""
         try:
@@ -161,39 +782,39 @@ class DocumentProcessor:
             
             # Try to use python-docx for .docx files
             if file_extension == '.docx':
-                try:
-                    from docx import Document as DocxDocument
+                text = _docx_paragraph_text(file_path)
+                
+                if not text.strip():
+                    try:
+                        from docx import Document as DocxDocument
+                    except ImportError:
+                        self.logger.warning("python-docx not available for .docx files")
+                        return [Document(
+                            page_content="Error: Cannot process .docx file. python-docx not installed.",
+                            metadata={
+                                'source': file_path,
+                                'file_type': 'docx',
+                                'error': 'python-docx not available'
+                            }
+                        )]
+                    # Try to extract from tables if no paragraph text
                     doc = DocxDocument(file_path)
-                    text = '\n'.join([paragraph.text for paragraph in doc.paragraphs])
-                    
-                    if not text.strip():
-                        # Try to extract from tables if no paragraph text
-                        table_text = []
-                        for table in doc.tables:
-                            for row in table.rows:
-                                for cell in row.cells:
-                                    if cell.text.strip():
-                                        table_text.append(cell.text.strip())
-                        text = '\n'.join(table_text)
-                    
-                    return [Document(
-                        page_content=text,
-                        metadata={
-                            'source': file_path,
-                            'file_type': 'docx',
-                            'file_size': os.path.getsize(file_path)
-                        }
-                    )]
-                except ImportError:
-                    self.logger.warning("python-docx not available for .docx files")
-                    return [Document(
-                        page_content="Error: Cannot process .docx file. python-docx not installed.",
-                        metadata={
-                            'source': file_path,
-                            'file_type': 'docx',
-                            'error': 'python-docx not available'
-                        }
-                    )]
+                    table_text = []
+                    for table in doc.tables:
+                        for row in table.rows:
+                            for cell in row.cells:
+                                if cell.text.strip():
+                                    table_text.append(cell.text.strip())
+                    text = '\n'.join(table_text)
+                
+                return [Document(
+                    page_content=text,
+                    metadata={
+                        'source': file_path,
+                        'file_type': 'docx',
+                        'file_size': os.path.getsize(file_path)
+                    }
+                )]
             
             # For .doc files or fallback
             elif file_extension == '.doc':
@@ -218,67 +839,427 @@ class DocumentProcessor:
     def get_page_count(self, pdf_path: str) -> int:
         """Gets the total number of pages in a PDF document."""
         try:
-            with fitz.open(pdf_path) as doc:
-                return doc.page_count
+            with _OPEN_PDF_LOCK:
+                return _open_pdf(pdf_path).page_count
         except Exception as e:
             logger.error(f"Error getting page count for {pdf_path}: {e}")
             raise
 
-    def get_full_text(self, pdf_path: str) -> str:
-        """Extracts and concatenates text from all pages of a PDF."""
+    def get_full_text(self, pdf_path: str, max_chars: Optional[int] = None) -> str:
+        """
+        Extracts and concatenates text from all pages of a PDF. With max_chars, only the
+        pages needed to fill that many characters are extracted and the text is cut there.
+        """
         try:
-            with fitz.open(pdf_path) as doc:
-                # Using a generator expression for memory efficiency
-                return "\n\n".join(page.get_text() for page in doc)
+            if max_chars is None:
+                # Shares get_page_texts' caches (and its parallel extraction for large PDFs), so a
+                # PDF already summarized or indexed is not parsed again
+                return "\n\n".join(self.get_page_texts(pdf_path))
+
+            buffer = io.StringIO()
+            pages = self.load_pages(pdf_path)
+            try:
+                for page_number, page_text in enumerate(pages):
+                    if page_number:
+                        buffer.write("\n\n")
+                    buffer.write(page_text)
+                    if buffer.tell() >= max_chars:
+                        break
+            finally:
+                pages.close()  # Closes the PDF now rather than when the generator is collected
+            return buffer.getvalue()[:max_chars]
         except Exception as e:
             logger.error(f"Error extracting full text from {pdf_path}: {e}")
             raise
 
     def get_text_from_page(self, pdf_path: str, page_number: int) -> str:
         """Extracts text from a specific page of a PDF."""
+        return self.get_text_from_pages(pdf_path, [page_number])[0]
+
+    def get_text_from_pages(self, pdf_path: str, page_numbers: List[int]) -> List[str]:
+        """Extracts text from several pages of a PDF (0-indexed, in the order given) reusing the open document."""
         try:
-            with fitz.open(pdf_path) as doc:
-                if not 0 <= page_number < doc.page_count:
+            with _OPEN_PDF_LOCK:
+                doc = _open_pdf(pdf_path)
+                if not all(0 <= page_number < doc.page_count for page_number in page_numbers):
                     raise ValueError("Page number out of bounds.")
-                page = doc.load_page(page_number)
-                return page.get_text()
+                return [
+                    doc.load_page(page_number).get_text("text", flags=TEXT_EXTRACTION_FLAGS)
+                    for page_number in page_numbers
+                ]
+        except Exception as e:
+            logger.error(f"Error extracting text from pages {page_numbers} of {pdf_path}: {e}")
+            raise
+
+    def load_pages(self, pdf_path: str) -> Iterator[str]:
+        """Yields the text of each page of a PDF, opening and parsing the file only once (a page that fails to parse yields "")."""
+        try:
+            with fitz.open(pdf_path) as doc:
+                for page_num in range(doc.page_count):
+                    yield _page_text(doc, page_num)
+        except Exception as e:
+            logger.error(f"Error loading pages from {pdf_path}: {e}")
+            raise
+
+    def get_page_texts(self, pdf_path: str, max_workers: Optional[int] = None) -> List[str]:
+        """Extracts the text of every page of a PDF, in page order, reusing cached results."""
+        key = self._page_texts_key(pdf_path)
+        if key is not None:
+            with self._page_texts_lock:
+                page_texts = self._page_texts_memory.get(key)
+                if page_texts is not None:
+                    self._page_texts_memory.move_to_end(key)
+                    return list(page_texts)
+
+        page_texts = self._read_page_texts(pdf_path, key, max_workers)
+
+        if key is not None:
+            with self._page_texts_lock:
+                self._page_texts_memory[key] = page_texts
+                if len(self._page_texts_memory) > PAGE_TEXT_MEMORY_CACHE_SIZE:
+                    self._page_texts_memory.popitem(last=False)
+        return list(page_texts)
+
+    def _read_page_texts(self, pdf_path: str, key: Optional[str], max_workers: Optional[int] = None) -> List[str]:
+        """Page texts of a PDF missing from the in-memory cache (CachedDocumentProcessor also checks disk)."""
+        return self._extract_page_texts(pdf_path, max_workers)
+
+    @staticmethod
+    def _page_texts_key(pdf_path: str) -> Optional[str]:
+        """Identifies a PDF's page texts; changes whenever the file or the parser changes."""
+        try:
+            stat = os.stat(pdf_path)
+        except OSError:
+            return None
+        return "|".join([
+            os.path.abspath(pdf_path), str(stat.st_mtime_ns), str(stat.st_size),
+            fitz.VersionBind, PAGE_TEXT_CACHE_VERSION
+        ])
+
+    def _extract_page_texts(self, pdf_path: str, max_workers: Optional[int] = None) -> List[str]:
+        """Extracts the text of every page of a PDF, in page order."""
+        try:
+            with fitz.open(pdf_path) as doc:
+                page_count = doc.page_count
+                if page_count < PARALLEL_EXTRACTION_MIN_PAGES:
+                    return _page_texts_in_range(doc, 0, page_count)
+
+            # Each worker opens the PDF once and extracts a contiguous page range
+            workers = max_workers or min(os.cpu_count() or 1, page_count)
+            step = -(-page_count // workers)
+            starts = list(range(0, page_count, step))
+            stops = [min(start + step, page_count) for start in starts]
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                page_ranges = executor.map(_extract_page_range, [pdf_path] * len(starts), starts, stops)
+                return [text for page_range in page_ranges for text in page_range]
         except Exception as e:
-            logger.error(f"Error extracting text from page {page_number} of {pdf_path}: {e}")
+            logger.error(f"Error extracting page texts from {pdf_path}: {e}")
             raise
 
 
+def file_fingerprint(file_path: str) -> str:
+    """Cheap identity of a file version (path, mtime and size), without reading its contents."""
+    stat = os.stat(file_path)
+    return f"{os.path.abspath(file_path)}|{stat.st_mtime_ns}|{stat.st_size}"
+
+
+@lru_cache(maxsize=256)
+def _file_digest(file_path: str, mtime_ns: int, size: int) -> str:
+    """SHA-256 of a file's contents; memoized per (path, mtime, size), so unchanged files are hashed once."""
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class CachedDocumentProcessor(DocumentProcessor):
+    """DocumentProcessor whose extracted text is cached on disk, in one SQLite file under cache_dir."""
+
+    _TABLES = ("documents", "page_texts", "file_metadata")
+
+    def __init__(self, cache_dir: str = DOCUMENT_CACHE_DIR):
+        super().__init__()
+        os.makedirs(cache_dir, exist_ok=True)
+        self.cache_path = os.path.join(cache_dir, DOCUMENT_CACHE_FILE)
+        cutoff = time.time() - DOCUMENT_CACHE_MAX_AGE_DAYS * 86400
+        with sqlite3.connect(self.cache_path, timeout=30) as conn:
+            for table in self._TABLES:
+                conn.execute(
+                    f"CREATE TABLE IF NOT EXISTS {table} "
+                    "(key TEXT PRIMARY KEY, data BLOB NOT NULL, created_at REAL NOT NULL)"
+                )
+                conn.execute(f"DELETE FROM {table} WHERE created_at < ?", (cutoff,))
+
+    def get_file_metadata(self, file_path: str, name: str) -> Optional[str]:
+        """A value stored for this version of the file (same path, mtime and size) by any process."""
+        try:
+            key = f"{file_fingerprint(file_path)}|{name}"
+        except OSError as e:
+            self.logger.warning(f"Could not read cached {name} for {file_path}: {e}")
+            return None
+        return self._cache_get("file_metadata", key)
+
+    def set_file_metadata(self, file_path: str, name: str, value: str):
+        """Stores a value derived from this version of the file, for every process to reuse."""
+        try:
+            key = f"{file_fingerprint(file_path)}|{name}"
+        except OSError as e:
+            self.logger.warning(f"Could not cache {name} for {file_path}: {e}")
+            return
+        self._cache_set("file_metadata", key, value)
+
+    def get_page_count(self, pdf_path: str) -> int:
+        """Gets the total number of pages in a PDF document, remembered across processes."""
+        cached = self.get_file_metadata(pdf_path, "page_count")
+        if cached is not None:
+            return int(cached)
+        page_count = super().get_page_count(pdf_path)
+        self.set_file_metadata(pdf_path, "page_count", str(page_count))
+        return page_count
+
+    def _read_page_texts(self, pdf_path: str, key: Optional[str], max_workers: Optional[int] = None) -> List[str]:
+        """Page texts from the cache database, or freshly extracted (and then stored there)."""
+        if key is not None:
+            page_texts = self._cache_get("page_texts", key)
+            if page_texts is not None:
+                return page_texts
+
+        page_texts = super()._read_page_texts(pdf_path, key, max_workers)
+
+        if key is not None:
+            self._cache_set("page_texts", key, page_texts)
+        return page_texts
+
+    def load_document(self, file_path: str) -> List[Document]:
+        """Load document, reusing the parsed result of a file with identical contents."""
+        # PDFs are built from their page texts, which are cached already, so their text is not stored twice
+        if Path(file_path).suffix.lower() == '.pdf':
+            return super().load_document(file_path)
+
+        try:
+            stat = os.stat(file_path)
+            key = "|".join([
+                _file_digest(os.path.abspath(file_path), stat.st_mtime_ns, stat.st_size),
+                Path(file_path).suffix.lower(), fitz.VersionBind, DOCUMENT_CACHE_VERSION
+            ])
+        except OSError:
+            # Missing files are reported by the normal loader
+            return super().load_document(file_path)
+
+        records = self._cache_get("documents", key)
+        if records is not None:
+            self.logger.info(f"Loaded {file_path} from the document cache")
+            # Cached entries may come from a copy of this file elsewhere, so the source is refreshed
+            return [
+                Document(page_content=record["page_content"], metadata={**record["metadata"], 'source': file_path})
+                for record in records
+            ]
+
+        documents = super().load_document(file_path)
+        # Placeholder documents for unsupported files are not cached, so installing
+        # the missing dependency takes effect on the next load
+        if not any('error' in doc.metadata for doc in documents):
+            self._cache_set("documents", key, [
+                {"page_content": doc.page_content, "metadata": doc.metadata} for doc in documents
+            ])
+        return documents
+
+    def _cache_get(self, table: str, key: str) -> Any:
+        """The JSON value stored under key in table, or None."""
+        try:
+            with sqlite3.connect(self.cache_path, timeout=30) as conn:
+                row = conn.execute(f"SELECT data FROM {table} WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            return json.loads(zlib.decompress(row[0]))
+        except (sqlite3.Error, zlib.error, ValueError) as e:
+            self.logger.warning(f"Ignoring unreadable {table} cache entry: {e}")
+            return None
+
+    def _cache_set(self, table: str, key: str, value: Any):
+        """Stores a JSON value under key in table, zlib-compressed."""
+        data = zlib.compress(json.dumps(value, ensure_ascii=False, default=str).encode('utf-8'))
+        try:
+            with sqlite3.connect(self.cache_path, timeout=30) as conn:
+                conn.execute(
+                    f"INSERT OR REPLACE INTO {table} (key, data, created_at) VALUES (?, ?, ?)",
+                    (key, data, time.time())
+                )
+        except sqlite3.Error as e:
+            self.logger.warning(f"Could not write {table} cache entry: {e}")
+
+
+def _embedding_model_kwargs() -> Dict[str, Any]:
+    """SentenceTransformer arguments: fp16 weights on a CUDA GPU when one is available, else CPU."""
+    if torch is not None and torch.cuda.is_available():
+        return {"device": "cuda", "model_kwargs": {"torch_dtype": torch.float16}}
+    return {"device": "cpu"}
+
+
+def _onnx_model_kwargs() -> Optional[Dict[str, Any]]:
+    """SentenceTransformer arguments for the int8 ONNX export on CPU, or None when it does not apply."""
+    if not EMBEDDING_ONNX_FILE or onnxruntime is None:
+        return None
+    if torch is not None and torch.cuda.is_available():
+        return None
+    return {"device": "cpu", "backend": "onnx", "model_kwargs": {"file_name": EMBEDDING_ONNX_FILE}}
+
+
+def _embedding_backend(model_kwargs: Dict[str, Any]) -> str:
+    """Label of the backend and precision SentenceTransformer runs with for these arguments."""
+    if model_kwargs.get("backend") == "onnx":
+        return f"onnx-{Path(model_kwargs['model_kwargs']['file_name']).stem}"
+    precision = "fp16" if "torch_dtype" in model_kwargs.get("model_kwargs", {}) else "fp32"
+    return f"{model_kwargs['device']}-{precision}"
+
+
+class QueryCachedEmbeddings(Embeddings):
+    """Embeddings wrapper keeping the vectors of the most recent queries in an in-memory LRU."""
+
+    def __init__(self, embeddings, maxsize: int = QUERY_EMBEDDING_CACHE_SIZE):
+        self.underlying_embeddings = embeddings
+        # Vectors are cached as tuples so a caller mutating its result cannot change the cache
+        self._cached_query = lru_cache(maxsize=maxsize)(
+            lambda text: tuple(self.underlying_embeddings.embed_query(text))
+        )
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.underlying_embeddings.embed_documents(texts)
+
+    def embed_query(self, text: str) -> List[float]:
+        return list(self._cached_query(text))
+
+
 class EmbeddingManager:
     """Manages embedding models with better error handling."""
 
-    def __init__(self, model_name: str = "sentence-transformers/all-MiniLM-L6-v2"):
+    def __init__(self, model_name: str = "sentence-transformers/all-MiniLM-L6-v2", cache_dir: Optional[str] = None):
         """
         Initializes the EmbeddingManager.
         Args:
             model_name: The name of the sentence-transformer model to use.
+            cache_dir: Optional directory for a content-addressed cache of document embeddings.
         """
         self.model_name = model_name
+        self.cache_dir = cache_dir
         self._embeddings = None
+        self._dimension: Optional[int] = None
+        self._load_lock = threading.Lock()
+        self._preload_thread: Optional[threading.Thread] = None
         self.logger = logging.getLogger(f"{__name__}.EmbeddingManager")
 
     def get_embeddings(self):
-        """Lazily loads and returns the embedding model instance."""
+        """Lazily loads and returns the embedding model instance (waiting for a preload in progress)."""
         if self._embeddings is None:
-            if HuggingFaceEmbeddings is None:
-                raise ImportError("HuggingFace embeddings not available. Install with: pip install langchain-huggingface")
-            
-            try:
-                self._embeddings = HuggingFaceEmbeddings(
-                    model_name=self.model_name,
-                    model_kwargs={"device": "cpu"},
-                    encode_kwargs={"normalize_embeddings": True},
-                )
-                self.logger.info(f"Loaded embedding model: {self.model_name}")
-            except Exception as e:
-                self.logger.error(f"Failed to load embedding model {self.model_name}: {e}")
-                raise
-                
+            with self._load_lock:
+                if self._embeddings is None:
+                    self._embeddings = self._load_embeddings()
         return self._embeddings
 
+    def preload(self):
+        """
+        Starts loading the model in a background thread, so the weights load while the caller
+        does other work (e.g. reading and splitting documents); get_embeddings waits for it.
+        """
+        if self._embeddings is not None or self._preload_thread is not None:
+            return
+        self._preload_thread = threading.Thread(target=self._preload, name="embedding-preload", daemon=True)
+        self._preload_thread.start()
+
+    def _preload(self):
+        try:
+            self.get_embeddings()
+        except Exception as e:
+            # get_embeddings retries the load (and raises) when the embeddings are first needed
+            self.logger.warning(f"Background load of embedding model {self.model_name} failed: {e}")
+
+    def _load_embeddings(self):
+        """Loads the model (shared across managers) and wraps it in this manager's caches."""
+        if HuggingFaceEmbeddings is None:
+            raise ImportError("HuggingFace embeddings not available. Install with: pip install langchain-huggingface")
+        
+        # Concurrent first calls (e.g. request threads) wait for one load instead of each loading the weights
+        with _EMBEDDINGS_LOCK:
+            embeddings = _EMBEDDINGS_CACHE.get(self.model_name)
+            onnx_kwargs = _onnx_model_kwargs() if embeddings is None else None
+            if onnx_kwargs is not None:
+                try:
+                    embeddings = self._load_model(onnx_kwargs)
+                    _EMBEDDINGS_CACHE[self.model_name] = embeddings
+                    _EMBEDDINGS_BACKENDS[self.model_name] = _embedding_backend(onnx_kwargs)
+                    self.logger.info(f"Loaded int8 ONNX embedding model: {self.model_name}")
+                except Exception as e:
+                    self.logger.warning(f"Int8 ONNX model unavailable for {self.model_name}, using PyTorch: {e}")
+            if embeddings is None:
+                try:
+                    model_kwargs = _embedding_model_kwargs()
+                    embeddings = self._load_model(model_kwargs)
+                    _EMBEDDINGS_CACHE[self.model_name] = embeddings
+                    _EMBEDDINGS_BACKENDS[self.model_name] = _embedding_backend(model_kwargs)
+                    self.logger.info(f"Loaded embedding model: {self.model_name}")
+                except Exception as e:
+                    self.logger.error(f"Failed to load embedding model {self.model_name}: {e}")
+                    raise
+
+        if self.cache_dir:
+            embeddings = self._with_cache(embeddings)
+        return QueryCachedEmbeddings(embeddings)
+
+    def get_dimension(self) -> int:
+        """Size of the model's embeddings, read from the model config rather than by encoding a text."""
+        if self._dimension is None:
+            embeddings = self.get_embeddings()
+            client = getattr(_EMBEDDINGS_CACHE.get(self.model_name), '_client', None)
+            if client is not None:
+                self._dimension = client.get_sentence_embedding_dimension()
+            if not self._dimension:
+                # Models whose config does not state it (e.g. custom pooling) need one forward pass
+                self._dimension = len(embeddings.embed_query("dimension"))
+        return self._dimension
+
+    def _load_model(self, model_kwargs: Dict[str, Any]):
+        """Loads the sentence-transformers model with the given SentenceTransformer arguments."""
+        return HuggingFaceEmbeddings(
+            model_name=self.model_name,
+            model_kwargs=model_kwargs,
+            encode_kwargs={"normalize_embeddings": True, "batch_size": EMBEDDING_BATCH_SIZE},
+        )
+
+    def _with_cache(self, embeddings):
+        """Wrap embeddings so unchanged texts are read from the cache instead of re-encoded."""
+        if CacheBackedEmbeddings is None:
+            self.logger.warning("Embedding cache not available, embeddings will not be cached")
+            return embeddings
+
+        # Keys are hashes of the text, namespaced by model and backend (int8 ONNX, fp16 GPU
+        # and fp32 CPU vectors differ slightly), so one index never mixes vectors of several
+        namespace = f"{self.model_name}:{_EMBEDDINGS_BACKENDS[self.model_name]}"
+        self.logger.info(f"Caching embeddings in: {self.cache_dir} ({namespace})")
+        return CacheBackedEmbeddings.from_bytes_store(
+            embeddings,
+            LocalFileStore(self.cache_dir),
+            namespace=namespace
+        )
+
     def is_available(self) -> bool:
         """Check if embeddings are available."""
         return HuggingFaceEmbeddings is not None
+
+
+@lru_cache(maxsize=1)
+def get_document_processor() -> DocumentProcessor:
+    """Returns the DocumentProcessor shared by everything in this process."""
+    if DOCUMENT_CACHE_DIR:
+        try:
+            return CachedDocumentProcessor(DOCUMENT_CACHE_DIR)
+        except (OSError, sqlite3.Error) as e:
+            logger.warning(f"Could not open document cache in {DOCUMENT_CACHE_DIR}: {e}")
+    return DocumentProcessor()
+
+
+@lru_cache(maxsize=4)
+def get_embedding_manager(model_name: str = "sentence-transformers/all-MiniLM-L6-v2",
+                          cache_dir: Optional[str] = None) -> EmbeddingManager:
+    """Returns a shared EmbeddingManager, so the model (and its cache wrapper) is set up once per process."""
+    return EmbeddingManager(model_name, cache_dir=cache_dir)
@@ -0,0 +1,20 @@
+"""
+Shared helpers for the *_wrapper.py scripts, which the web app runs as subprocesses
+and whose stdout it parses as JSON
+"""
+
+import sys
+import json
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+def print_json(payload):
+    """Write the response as one JSON line on stdout, with orjson when it is installed."""
+    if orjson is not None:
+        sys.stdout.buffer.write(orjson.dumps(payload) + b"\n")
+        sys.stdout.flush()
+    else:
+        print(json.dumps(payload))